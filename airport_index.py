@@ -0,0 +1,283 @@
+import csv
+import logging
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Returned by AirportIndex.lookup when a name is unknown locally and the
+# caller should ask the Amadeus locations API instead.
+MISS = object()
+
+# IATA city codes. Amadeus hotel search takes a city code, which for a city
+# with several airports is not any one airport's code (Orlando is ORL, not
+# MCO; Detroit is DTT). The airport CSVs cannot tell a city's main airport
+# from its regional ones either, so well-known cities are listed here.
+CITY_CODES = {
+    # United States
+    'new york': 'NYC', 'new york city': 'NYC', 'chicago': 'CHI', 'washington': 'WAS',
+    'washington dc': 'WAS', 'houston': 'HOU', 'detroit': 'DTT', 'orlando': 'ORL',
+    'kansas city': 'MKC', 'dallas': 'DFW', 'los angeles': 'LAX', 'las vegas': 'LAS',
+    'san francisco': 'SFO', 'san diego': 'SAN', 'miami': 'MIA', 'boston': 'BOS',
+    'seattle': 'SEA', 'denver': 'DEN', 'atlanta': 'ATL', 'phoenix': 'PHX',
+    'philadelphia': 'PHL', 'honolulu': 'HNL', 'new orleans': 'MSY', 'nashville': 'BNA',
+    'austin': 'AUS', 'minneapolis': 'MSP', 'salt lake city': 'SLC', 'tampa': 'TPA',
+    'charlotte': 'CLT', 'sacramento': 'SAC',
+    # Europe
+    'london': 'LON', 'paris': 'PAR', 'rome': 'ROM', 'milan': 'MIL', 'moscow': 'MOW',
+    'stockholm': 'STO', 'madrid': 'MAD', 'barcelona': 'BCN', 'berlin': 'BER',
+    'amsterdam': 'AMS', 'brussels': 'BRU', 'vienna': 'VIE', 'prague': 'PRG', 'lisbon': 'LIS',
+    'dublin': 'DUB', 'athens': 'ATH', 'istanbul': 'IST', 'munich': 'MUC', 'frankfurt': 'FRA',
+    'zurich': 'ZRH', 'copenhagen': 'CPH', 'oslo': 'OSL', 'venice': 'VCE', 'budapest': 'BUD',
+    'warsaw': 'WAW', 'bucharest': 'BUH',
+    # Elsewhere
+    'tokyo': 'TYO', 'osaka': 'OSA', 'nagoya': 'NGO', 'sapporo': 'SPK', 'seoul': 'SEL',
+    'beijing': 'BJS', 'shanghai': 'SHA', 'jakarta': 'JKT', 'bangkok': 'BKK',
+    'singapore': 'SIN', 'hong kong': 'HKG', 'dubai': 'DXB', 'sydney': 'SYD',
+    'toronto': 'YTO', 'montreal': 'YMQ', 'vancouver': 'YVR', 'mexico city': 'MEX',
+    'cancun': 'CUN', 'sao paulo': 'SAO', 'rio de janeiro': 'RIO', 'buenos aires': 'BUE',
+    'belo horizonte': 'BHZ',
+}
+
+# Lookup scores: name bonuses add at most 2, so they only break ties between
+# candidates of the same kind (score // INTERNATIONAL). A listed city code
+# outranks every airport.
+CITY = 50
+INTERNATIONAL = 10
+
+# API answers kept by `remember`; the least recently used are dropped first
+MAX_LEARNED = 5000
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+_CODE = re.compile(r'^[A-Z]{3}$')
+_AIRPORT_SUFFIX = re.compile(r'\s+(international\s+)?(airport|airfield|airstrip|aerodrome)$')
+
+
+def normalize(text):
+    """Lowercase, strip accents and punctuation, and collapse whitespace"""
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(' ', text.lower()).strip()
+
+
+class _Node:
+    """Edge-compressed trie node; `label` is the text on the edge into it"""
+    __slots__ = ('label', 'children', 'entries')
+
+    def __init__(self, label=''):
+        self.label = label
+        self.children = {}
+        self.entries = []
+
+
+class AirportIndex:
+    """In-memory resolver from city/airport names to IATA city or airport codes.
+
+    Exact names are answered from a hash index; partial names walk a
+    compressed prefix trie. Input typed as a code ("LAX") is taken as one,
+    so words like "San" or "new" are never mistaken for codes. Answers fetched from the API on a miss can be
+    stored with `remember` so the same name is only looked up once.
+    """
+
+    def __init__(self, iata_path='IATA_List.csv', usa_path='USA_Airports_IATA.csv'):
+        self.exact = {}
+        self.root = _Node()
+        self.learned = OrderedDict()
+        self._lock = threading.Lock()
+
+        airports, self.countries = self._read_airports(iata_path, usa_path)
+        for code, name, municipalities in airports.values():
+            self._add_airport(code, name, municipalities)
+        for city, code in CITY_CODES.items():
+            self._add(city, (CITY, code))
+        self.codes = set(airports) | set(CITY_CODES.values())
+        logger.info("Built airport index with %d airports and %d names", len(airports), len(self.exact))
+
+    @staticmethod
+    def _read_airports(iata_path, usa_path):
+        """Merge both CSVs into {code: (code, airport name, {municipalities})}"""
+        airports = {}
+        countries = {}
+        if os.path.exists(iata_path):
+            with open(iata_path, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    code = (row.get('iata_code') or '').strip().upper()
+                    if not code:
+                        continue
+                    municipalities = set()
+                    if row.get('municipality'):
+                        municipalities.add(row['municipality'])
+                    airports[code] = (code, row.get('airport name') or '', municipalities)
+                    countries[code] = row.get('country') or ''
+        if os.path.exists(usa_path):
+            with open(usa_path, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    code = (row.get('iata_code') or '').strip().upper()
+                    if not code:
+                        continue
+                    entry = airports.setdefault(code, (code, '', set()))
+                    countries.setdefault(code, row.get('country') or '')
+                    if row.get('municipality'):
+                        entry[2].add(row['municipality'])
+        return airports, countries
+
+    def _add_airport(self, code, name, municipalities):
+        # Prefer international airports when a city has several
+        base = INTERNATIONAL if 'international' in name.lower() else 0
+        full_name = normalize(name)
+        short_name = _AIRPORT_SUFFIX.sub('', full_name)
+
+        keys = set()
+        for municipality in municipalities:
+            keys.add(normalize(municipality))
+            # "Paris (Orly, Val-de-Marne)" and "Gatwick, Surrey" also match on
+            # their leading place name
+            head = re.split(r'[(,/]', municipality)[0]
+            keys.add(normalize(head))
+        keys.update((full_name, short_name))
+        keys.discard('')
+
+        for key in keys:
+            # "Orlando International Airport" beats "Orlando Executive
+            # Airport", which beats an airport without the city in its name
+            score = base
+            if full_name.startswith(key):
+                score += 1
+            if short_name == key:
+                score += 1
+            self._add(key, (score, code))
+
+    def _add(self, key, entry):
+        self.exact.setdefault(key, []).append(entry)
+        self._insert(key, entry)
+
+    def _insert(self, key, entry):
+        node = self.root
+        i = 0
+        while i < len(key):
+            child = node.children.get(key[i])
+            if child is None:
+                child = _Node(key[i:])
+                node.children[key[i]] = child
+                node = child
+                break
+            label = child.label
+            j = 0
+            while j < len(label) and i + j < len(key) and label[j] == key[i + j]:
+                j += 1
+            if j < len(label):
+                # Split the edge at the first mismatching character
+                middle = _Node(label[:j])
+                child.label = label[j:]
+                middle.children[child.label[0]] = child
+                node.children[key[i]] = middle
+                child = middle
+            node = child
+            i += j
+        node.entries.append(entry)
+
+    def _find_prefix(self, prefix):
+        node = self.root
+        i = 0
+        while i < len(prefix):
+            child = node.children.get(prefix[i])
+            if child is None:
+                return None
+            rest = prefix[i:]
+            if rest.startswith(child.label):
+                i += len(child.label)
+                node = child
+            elif child.label.startswith(rest):
+                return child
+            else:
+                return None
+        return node
+
+    def _collect(self, node):
+        """Best score of every code under `node`; callers rank before truncating"""
+        found = {}
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            for score, code in current.entries:
+                if score > found.get(code, -1):
+                    found[code] = score
+            stack.extend(current.children.values())
+        return found
+
+    def _best(self, candidates):
+        """Return the single highest-scoring code, or None if it is ambiguous"""
+        if not candidates:
+            return None
+        best = {}
+        for score, code in candidates:
+            best[code] = max(score, best.get(code, -1))
+        top = max(best.values())
+        codes = [code for code, score in best.items() if score == top]
+        if len(codes) != 1:
+            return None
+        # Only candidates of the top one's kind can make it ambiguous; a
+        # regional airport elsewhere does not (Los Angeles, Chile)
+        contenders = [code for code, score in best.items() if score // INTERNATIONAL == top // INTERNATIONAL]
+        # Same city name in different countries
+        if len({self.countries.get(code) for code in contenders}) > 1:
+            return None
+        # Between several regional airports the name alone is not enough to
+        # pick the right one
+        if len(contenders) > 1 and top < INTERNATIONAL:
+            return None
+        return codes[0]
+
+    def lookup(self, name):
+        """Resolve a city or airport name to an IATA code.
+
+        Returns the code, None if the API previously reported no match, or
+        MISS when the name is unknown or ambiguous locally.
+        """
+        if _CODE.match(str(name).strip()) and str(name).strip() in self.codes:
+            return str(name).strip()
+        key = normalize(name)
+        if not key:
+            return MISS
+        with self._lock:
+            if key in self.learned:
+                self.learned.move_to_end(key)
+                return self.learned[key]
+
+        code = self._best(self.exact.get(key))
+        if code:
+            return code
+
+        # Fall back to the prefix trie for partially typed names
+        node = self._find_prefix(key)
+        if node is not None:
+            candidates = self._collect(node)
+            code = self._best([(score, code) for code, score in candidates.items()])
+            if code:
+                return code
+        return MISS
+
+    def suggest(self, prefix, limit=10):
+        """Return up to `limit` IATA codes whose names start with `prefix`"""
+        key = normalize(prefix)
+        if not key:
+            return []
+        node = self._find_prefix(key)
+        if node is None:
+            return []
+        candidates = self._collect(node)
+        ranked = sorted(candidates.items(), key=lambda item: (-item[1], item[0]))
+        return [code for code, _ in ranked[:limit]]
+
+    def remember(self, name, code):
+        """Cache an API answer (a code, or None for no match) for `name`"""
+        key = normalize(name)
+        if key:
+            with self._lock:
+                self.learned[key] = code
+                self.learned.move_to_end(key)
+                while len(self.learned) > MAX_LEARNED:
+                    self.learned.popitem(last=False)
@@ -0,0 +1,147 @@
+"""Micro-benchmark: snippet extraction in web_search, old vs. new.
+
+Usage:
+    python bench_html_extract.py [PAGES_DIR] [--save DIR]
+
+PAGES_DIR is a folder of saved .html pages (e.g. pages fetched by the
+chatbot). Without it a synthetic corpus is generated covering long
+script-heavy pages, pages without paragraphs and pathological whitespace;
+--save writes that corpus to DIR for reuse.
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+from bs4 import BeautifulSoup
+
+from html_extract import MAX_PAGE_BYTES, SNIPPET_LENGTH, extract_snippet
+
+
+def legacy_extract(html):
+    """The BeautifulSoup extraction web_search used before html_extract"""
+    soup = BeautifulSoup(html, 'html.parser')
+    title = soup.title.string if soup.title else "No title available"
+    content = ""
+    paragraphs = soup.find_all('p')
+    if paragraphs:
+        content = ' '.join([p.get_text() for p in paragraphs[:3]])
+    if not content or len(content) < 50:
+        for tag in ['article', 'main', 'div', 'section']:
+            if content and len(content) >= 50:
+                break
+            for element in soup.find_all(tag):
+                element_text = element.get_text().strip()
+                if len(element_text) > 100:
+                    content = element_text
+                    break
+    if not content or len(content) < 50:
+        body = soup.find('body')
+        if body:
+            content = body.get_text()
+    content = content.replace('\n', ' ').replace('\r', ' ').replace('\t', ' ')
+    while '  ' in content:
+        content = content.replace('  ', ' ')
+    return title, content
+
+
+def streamed_extract(html, chunk_size=16 * 1024):
+    """Feed the page the way fetch_page does: in chunks, capped at MAX_PAGE_BYTES"""
+    data = html.encode('utf-8')[:MAX_PAGE_BYTES].decode('utf-8', errors='ignore')
+    chunks = (data[i:i + chunk_size] for i in range(0, len(data), chunk_size))
+    return extract_snippet(chunks)
+
+
+WORDS = ("travel hotel beach museum city tour flight guide food market park river "
+         "night view local history festival street coffee bridge garden").split()
+
+
+def _sentence(rng, n=20):
+    return ' '.join(rng.choice(WORDS) for _ in range(n)).capitalize() + '.'
+
+
+def synthetic_corpus(seed=7):
+    """Pages shaped like the travel sites the chatbot fetches"""
+    rng = random.Random(seed)
+    pages = {}
+    script = '<script>' + 'var x = 1;' * 5000 + '</script>'
+    nav = '<nav>' + ''.join(f'<a href="/{w}">{w}</a>' for w in WORDS * 20) + '</nav>'
+    for i in range(20):
+        divs = ''.join(f'<div class="card"><span>{_sentence(rng, 8)}</span></div>' for _ in range(300))
+        paragraphs = ''.join(f'<p>{_sentence(rng)}</p>' for _ in range(40))
+        pages[f'guide_{i}.html'] = (
+            f'<html><head><title>City guide {i}</title>{script}</head>'
+            f'<body>{nav}{divs}<article>{paragraphs}</article></body></html>'
+        )
+    for i in range(5):
+        # No <p> at all: content lives in nested divs
+        divs = ''.join(f'<div><div>{_sentence(rng, 30)}</div></div>' for _ in range(500))
+        pages[f'no_paragraphs_{i}.html'] = f'<html><head><title>Listing {i}</title></head><body>{divs}</body></html>'
+    for i in range(3):
+        # Long runs of whitespace, which the old cleanup loop handled quadratically
+        spaces = ' ' * 20000
+        body = ''.join(f'<span>{w}{spaces}</span>' for w in WORDS * 5)
+        pages[f'whitespace_{i}.html'] = f'<html><head><title>Spaces {i}</title></head><body>{body}</body></html>'
+    paragraphs = ''.join(f'<p>{_sentence(rng)}</p>' for _ in range(20000))
+    pages['huge.html'] = f'<html><head><title>Huge page</title></head><body>{paragraphs}</body></html>'
+    return pages
+
+
+def load_corpus(directory):
+    pages = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(('.html', '.htm')):
+            with open(os.path.join(directory, name), encoding='utf-8', errors='replace') as f:
+                pages[name] = f.read()
+    return pages
+
+
+def time_extractor(extract, pages, repeat=3):
+    """Best-of-`repeat` CPU seconds per page"""
+    timings = {}
+    for name, html in pages.items():
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.process_time()
+            extract(html)
+            best = min(best, time.process_time() - start)
+        timings[name] = best
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pages_dir', nargs='?')
+    parser.add_argument('--save', metavar='DIR')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    pages = load_corpus(args.pages_dir) if args.pages_dir else synthetic_corpus()
+    if args.save:
+        os.makedirs(args.save, exist_ok=True)
+        for name, html in pages.items():
+            with open(os.path.join(args.save, name), 'w', encoding='utf-8') as f:
+                f.write(html)
+    print(f"{len(pages)} pages, {sum(len(h) for h in pages.values()) / 1e6:.1f} MB total")
+
+    old = time_extractor(legacy_extract, pages, args.repeat)
+    new = time_extractor(streamed_extract, pages, args.repeat)
+
+    print(f"{'page':<24}{'bytes':>10}{'old ms':>10}{'new ms':>10}{'speedup':>10}")
+    for name, html in pages.items():
+        print(f"{name:<24}{len(html):>10}{old[name] * 1000:>10.2f}{new[name] * 1000:>10.2f}"
+              f"{old[name] / max(new[name], 1e-6):>9.1f}x")
+    print(f"median per page: old {statistics.median(old.values()) * 1000:.2f} ms, "
+          f"new {statistics.median(new.values()) * 1000:.2f} ms")
+    print(f"total: old {sum(old.values()):.3f} s, new {sum(new.values()):.3f} s")
+
+    # Spot check that both produce a usable snippet
+    name = next(iter(pages))
+    for label, extract in (('old', legacy_extract), ('new', streamed_extract)):
+        title, content = extract(pages[name])
+        print(f"{label} [{name}] {title!r}: {content[:SNIPPET_LENGTH // 3]!r}...")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""Load test: concurrent simulated sessions against replayed upstream services.
+
+Usage:
+    python bench_load.py [--sessions N] [--rounds R] [--fixtures DIR]
+                         [--latency S] [--error-rate F] [--drop-rate F]
+
+Each session repeatedly does what a user of app2.py does: a flight/hotel/
+attraction search, pricing the first page of hotels, a chat question and a
+click on a suggested question. Every upstream call is answered by
+replay.ReplayAdapter (recordings from --fixtures, synthetic responses
+otherwise), so runs need no network or API keys and are repeatable.
+Caches, the knowledge index and the search history store live in a
+temporary directory, so every run starts cold and leaves the working
+directory untouched. Record fixtures from the live app with
+HTTP_RECORD_DIR=DIR streamlit run app2.py.
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from functools import partial
+
+import numpy as np
+
+CITY_PAIRS = [
+    ('Seattle', 'Chicago'), ('New York', 'Miami'), ('Boston', 'Denver'), ('Chicago', 'Los Angeles'),
+    ('Los Angeles', 'Seattle'), ('Denver', 'New York'), ('Miami', 'Boston'), ('San Francisco', 'Las Vegas'),
+]
+QUESTIONS = [
+    "What are the best things to do in {city}?",
+    "Where should I eat in {city}?",
+    "What is the weather like in {city}?",
+    "Which neighborhoods are best to stay in {city}?",
+]
+
+
+def configure(args, workdir):
+    """Point http_client at the replay adapter and the caches at `workdir`; before importing the app modules"""
+    os.environ['HTTP_REPLAY_DIR'] = args.fixtures or ''
+    os.environ['HTTP_REPLAY_LATENCY'] = str(args.latency)
+    os.environ['HTTP_REPLAY_ERROR_RATE'] = str(args.error_rate)
+    os.environ['HTTP_REPLAY_DROP_RATE'] = str(args.drop_rate)
+    os.environ['PAGE_CACHE_DB'] = os.path.join(workdir, 'page_cache.sqlite')
+    os.environ['KNOWLEDGE_INDEX_PATH'] = os.path.join(workdir, 'knowledge_index.json')
+    os.environ.pop('RESPONSE_CACHE_DB', None)
+    os.environ.setdefault('GOOGLE_PLACES_API_KEY', 'replay')
+
+
+class Recorder:
+    def __init__(self):
+        self.timings = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def timed(self, action, func, *args):
+        start = time.perf_counter()
+        try:
+            result = func(*args)
+            failed = isinstance(result, dict) and 'error' in result
+        except Exception as e:
+            result, failed = None, True
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.timings[action].append(elapsed)
+            if failed:
+                self.errors[action] += 1
+        return result
+
+
+def run_session(session_id, rounds, recorder, chatbot):
+    # Imported here so configure() has already run
+    import travel_api
+    from flight_table import offers_to_frame, pareto_front
+    from geo_index import DestinationGeo
+    from knowledge_index import default_index
+    from search_orchestrator import run_search
+    from web_search import stream_chatbot_response
+
+    rng = random.Random(session_id)
+    for _ in range(rounds):
+        origin_city, destination_city = rng.choice(CITY_PAIRS)
+        day = (date.today() + timedelta(days=rng.randrange(7, 90))).strftime("%Y-%m-%d")
+
+        def search():
+            origin = travel_api.city_to_iata(origin_city)
+            destination = travel_api.city_to_iata(destination_city)
+            results, timed_out = run_search({
+                'flights': partial(travel_api.get_flight_offers, origin, destination, day),
+                'hotels': partial(travel_api.get_hotels, destination),
+                'attractions': partial(travel_api.get_attractions_by_city, destination_city, travel_api.google_api),
+            })
+            flights, hotels, attractions = (results.get(k) for k in ('flights', 'hotels', 'attractions'))
+            if isinstance(flights, list):
+                pareto_front(offers_to_frame(flights))
+            if isinstance(attractions, list):
+                default_index.add_attractions(attractions, destination_city)
+            DestinationGeo(hotels if isinstance(hotels, list) else [],
+                           attractions if isinstance(attractions, list) else [])
+            return {'error': ', '.join(timed_out)} if timed_out else hotels
+
+        hotels = recorder.timed('search', search)
+
+        if isinstance(hotels, list) and hotels:
+            ids = [hotel['hotelId'] for hotel in hotels[:10]]
+            recorder.timed('hotel_prices', travel_api.get_hotel_offers, ids, day)
+
+        def chat(question):
+            chunks = stream_chatbot_response(question, destination_city)
+            first = recorder.timed('chat_first_chunk', next, chunks)
+            return (first or '') + ''.join(chunks)
+
+        recorder.timed('chat', chat, rng.choice(QUESTIONS).format(city=destination_city))
+        suggestions = chatbot.get_suggested_queries(destination_city) if chatbot else []
+        if suggestions:
+            recorder.timed('suggestion', chat, rng.choice(suggestions))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=20, help="concurrent simulated users")
+    parser.add_argument('--rounds', type=int, default=5, help="search/chat rounds per session")
+    parser.add_argument('--fixtures', metavar='DIR', help="recorded responses (default: synthetic only)")
+    parser.add_argument('--latency', type=float, default=0.2, help="mean upstream latency in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of upstream calls answered with 503")
+    parser.add_argument('--drop-rate', type=float, default=0.0, help="fraction of upstream calls that fail to connect")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_load_')
+    configure(args, workdir)
+    import http_client
+    from predictive_chatbot import PredictiveChatbot
+
+    # Read-only: the harness never records queries or retrains. Its history
+    # store lives in the temporary directory, like the caches.
+    chatbot = PredictiveChatbot(db_path=os.path.join(workdir, 'search_history.sqlite'))
+    recorder = Recorder()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+        sessions = [pool.submit(run_session, i, args.rounds, recorder, chatbot) for i in range(args.sessions)]
+        for future in sessions:
+            future.result()
+    wall = time.perf_counter() - start
+
+    print(f"\n{args.sessions} sessions x {args.rounds} rounds in {wall:.1f}s "
+          f"(latency {args.latency}s, errors {args.error_rate:.0%}, drops {args.drop_rate:.0%})")
+    print(f"{'action':<18}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for action, samples in recorder.timings.items():
+        p50, p95, p99 = np.percentile(np.array(samples) * 1000, [50, 95, 99])
+        print(f"{action:<18}{len(samples):>7}{recorder.errors[action]:>8}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}")
+    print("\nupstream calls:")
+    for route, count in sorted(http_client.default_client.adapter.stats().items()):
+        print(f"  {route:<14}{count:>7}")
+
+
+if __name__ == '__main__':
+    main()
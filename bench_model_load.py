@@ -0,0 +1,78 @@
+"""Cold-load benchmark: pickled chatbot model vs. memory-mapped artifact.
+
+Usage:
+    python bench_model_load.py [--sizes 10000,100000,1000000] [--repeat 3]
+
+Trains the suggestion model on a synthetic history (see bench_training.py),
+saves it both ways and times, in fresh interpreters, loading it and
+vectorizing a first query. The artifact maps its arrays instead of
+unpickling them, so the load itself reads only the manifest.
+"""
+import argparse
+import json
+import os
+import pickle
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from bench_training import new_train, synthetic_history
+import model_artifact
+
+PICKLE_SCRIPT = """
+import json, pickle, time
+start = time.perf_counter()
+with open({path!r}, 'rb') as f:
+    resources = pickle.load(f)
+loaded = time.perf_counter() - start
+resources['vectorizer'].transform(['best pizza in Seattle'])
+print(json.dumps({{'load': loaded, 'first': time.perf_counter() - start}}))
+"""
+
+ARTIFACT_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import model_artifact
+resources = model_artifact.load({path!r})
+loaded = time.perf_counter() - start
+resources['vectorizer'].transform(['best pizza in Seattle'])
+print(json.dumps({{'load': loaded, 'first': time.perf_counter() - start}}))
+"""
+
+
+def run(script):
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    for line in reversed(result.stdout.strip().splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "no output")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_model_load_')
+    print(f"{'rows':>9}{'terms':>9}{'pickle load':>13}{'+ first query':>15}"
+          f"{'artifact load':>15}{'+ first query':>15}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        _, chatbot = new_train(synthetic_history(size), workdir)
+        pickle_path = os.path.join(workdir, f'model-{size}.pkl')
+        with open(pickle_path, 'wb') as f:
+            pickle.dump(chatbot._resources, f)
+        artifact_dir = os.path.join(workdir, f'model-{size}')
+        model_artifact.save(artifact_dir, chatbot._resources)
+        line = f"{size:>9}{len(chatbot.vectorizer.vocabulary_):>9}"
+        for script, path in ((PICKLE_SCRIPT, pickle_path), (ARTIFACT_SCRIPT, artifact_dir)):
+            samples = [run(script.format(path=path)) for _ in range(args.repeat)]
+            line += (f"{statistics.median(s['load'] for s in samples) * 1000:>11.1f}ms"
+                     f"{statistics.median(s['first'] for s in samples) * 1000:>13.1f}ms")
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
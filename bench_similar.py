@@ -0,0 +1,91 @@
+"""Recall/latency benchmark: similar_queries LSH search vs. exact search.
+
+Usage:
+    python bench_similar.py [--sizes 10000,100000,1000000] [--queries 200] [--k 5]
+
+Indexes a synthetic search history (see bench_training.py) and looks up
+perturbed copies of random history queries. Exact search scores every
+row; LSH scores only the rows sharing a bucket with the query. Recall is
+the share of LSH hits that score at least as high as the k-th exact hit,
+so ties between equally similar queries do not count as misses.
+"""
+import argparse
+import random
+import statistics
+import time
+
+import numpy as np
+
+from bench_training import FILL, synthetic_history
+from similarity_index import SimilarityIndex
+
+
+def perturb(query, rng):
+    """Drop a word and sometimes add one, like a user rephrasing a question"""
+    words = query.split()
+    if len(words) > 2:
+        words.pop(rng.randrange(len(words)))
+    if rng.random() < 0.5:
+        words.insert(rng.randrange(len(words) + 1), rng.choice(FILL['city']))
+    return ' '.join(words)
+
+
+def timed(search, probes):
+    results, seconds = [], []
+    for text, destination in probes:
+        start = time.perf_counter()
+        results.append(search(text, destination))
+        seconds.append(time.perf_counter() - start)
+    return results, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--tables', type=int, default=None, help="LSH tables (default: the index's)")
+    parser.add_argument('--bits', type=int, default=None, help="bits per table")
+    parser.add_argument('--probes', type=int, default=None, help="extra buckets probed per table")
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    print(f"{'rows':>9}{'build s':>9}{'exact p50':>11}{'exact p95':>11}"
+          f"{'lsh p50':>9}{'lsh p95':>9}{'recall':>8}{'dest recall':>13}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        history = synthetic_history(size)
+        start = time.perf_counter()
+        options = {name: value for name, value in
+                   (('n_tables', args.tables), ('n_bits', args.bits), ('probes', args.probes))
+                   if value is not None}
+        index = SimilarityIndex(lsh_threshold=0, **options).build(history['query'].tolist(),
+                                                      history['destination'].tolist())
+        build_seconds = time.perf_counter() - start
+        rows = [history.iloc[rng.randrange(len(history))] for _ in range(args.queries)]
+        probes = [(perturb(row['query'], rng), None) for row in rows]
+        dest_probes = [(text, row['destination']) for (text, _), row in zip(probes, rows)]
+
+        line = f"{len(history):>9}{build_seconds:>9.1f}"
+        for batch, label in ((probes, 'all'), (dest_probes, 'dest')):
+            exact, exact_seconds = timed(lambda t, d: index.search(t, d, args.k, exact=True), batch)
+            approx, lsh_seconds = timed(lambda t, d: index.search(t, d, args.k), batch)
+            found = total = 0
+            for truth, hits in zip(exact, approx):
+                if not truth:
+                    continue
+                kth = truth[-1][0]
+                found += sum(1 for score, _ in hits if score >= kth - 1e-9)
+                total += len(truth)
+            recall = found / total if total else 1.0
+            if label == 'all':
+                line += (f"{statistics.median(exact_seconds) * 1000:>9.2f}ms"
+                         f"{np.percentile(exact_seconds, 95) * 1000:>9.2f}ms"
+                         f"{statistics.median(lsh_seconds) * 1000:>7.2f}ms"
+                         f"{np.percentile(lsh_seconds, 95) * 1000:>7.2f}ms{recall:>8.3f}")
+            else:
+                line += f"{recall:>13.3f}"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Cold-start benchmark: module import times and first render of app2.py.
+
+Usage:
+    python bench_startup.py [--repeat N]
+
+Every measurement runs in a fresh interpreter so nothing is cached in
+sys.modules. The first-render run uses Streamlit's AppTest, records which
+heavy libraries the render pulled in, and talks to replayed upstreams
+(see replay.py) so it needs no network.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+MODULES = [
+    'streamlit', 'pandas', 'transcribe_mp3', 'predictive_chatbot', 'chatbot_integration',
+    'geo_index', 'travel_api', 'web_search', 'knowledge_index',
+]
+# Libraries that should only be imported when a feature needs them
+HEAVY = ['sklearn', 'transformers', 'torch', 'bs4', 'googlesearch']
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{'seconds': time.perf_counter() - start}}))
+"""
+
+RENDER_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file('app2.py', default_timeout=120)
+at.run()
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': elapsed,
+    'exceptions': [str(e.value) for e in at.exception],
+    'heavy': [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+
+def run(script, env):
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                            env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+    for line in reversed(result.stdout.strip().splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "no output")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    env = dict(os.environ, HTTP_REPLAY_DIR=os.environ.get('HTTP_REPLAY_DIR', ''))
+    print(f"{'import':<22}{'median ms':>10}")
+    for module in MODULES:
+        try:
+            samples = [run(IMPORT_SCRIPT.format(module=module), env)['seconds'] for _ in range(args.repeat)]
+            print(f"{module:<22}{statistics.median(samples) * 1000:>10.0f}")
+        except RuntimeError as e:
+            print(f"{module:<22}{'failed':>10}  {e}")
+
+    renders = []
+    for _ in range(args.repeat):
+        try:
+            renders.append(run(RENDER_SCRIPT.format(heavy=HEAVY), env))
+        except RuntimeError as e:
+            print(f"first render failed: {e}")
+            return
+    print(f"\nfirst render (import + script run): median "
+          f"{statistics.median(r['seconds'] for r in renders) * 1000:.0f} ms")
+    print(f"heavy libraries loaded by first render: {', '.join(renders[-1]['heavy']) or 'none'}")
+    if renders[-1]['exceptions']:
+        print(f"app raised: {renders[-1]['exceptions']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Scaling benchmark: PredictiveChatbot.train_model, old vs. new.
+
+Usage:
+    python bench_training.py [--sizes 1000,10000,100000,1000000] [--legacy-max 20000]
+
+Builds a synthetic search history of N (query, destination) rows with
+Zipf-distributed counts and times both training implementations on it.
+The old one expands rows by count and has quadratic loops, so it only
+runs up to --legacy-max rows. For sizes both can handle, the fitted
+vocabularies and idf weights are compared to show they agree.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from predictive_chatbot import PredictiveChatbot
+
+TEMPLATES = [
+    "best {food} in {city}", "things to do in {city}", "cheap hotels near {place}",
+    "how to get from {place} to {city}", "is {city} safe at night", "{food} restaurants open late",
+    "weather in {city} in {month}", "day trip from {city}", "tell me more about {place}",
+]
+FILL = {
+    'food': ["pizza", "sushi", "tacos", "ramen", "mexican food", "chinese food", "seafood", "bbq"],
+    'city': ["Seattle", "Miami", "Paris", "Tokyo", "Chicago", "Honolulu", "Denver", "Boston"],
+    'place': ["the airport", "downtown", "the beach", "the old town", "the convention center", "the stadium"],
+    'month': ["January", "April", "June", "August", "October", "December"],
+}
+
+
+def synthetic_history(rows, seed=7):
+    rng = random.Random(seed)
+    queries, destinations = [], []
+    for i in range(rows):
+        template = rng.choice(TEMPLATES)
+        text = template.format(**{k: rng.choice(v) for k, v in FILL.items()})
+        # A numeric suffix keeps rows distinct once the templates run out
+        queries.append(f"{text} {i // 100}")
+        destinations.append(rng.choice(FILL['city']))
+    counts = np.minimum(np.random.default_rng(seed).zipf(1.8, rows), 50)
+    history = pd.DataFrame({'query': queries, 'destination': destinations, 'count': counts})
+    return history.groupby(['query', 'destination'], as_index=False, sort=False)['count'].sum()
+
+
+def legacy_train(history):
+    """The train_model body before weighted training, minus saving"""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.neighbors import NearestNeighbors
+    from sklearn.cluster import KMeans
+
+    queries = []
+    for _, row in history.iterrows():
+        for _ in range(int(row['count'])):
+            queries.append(row['query'])
+    vectorizer = TfidfVectorizer(min_df=2, max_df=0.7, ngram_range=(1, 2))
+    X = vectorizer.fit_transform(queries)
+    NearestNeighbors(n_neighbors=5, algorithm='ball_tree').fit(X)
+    common_queries = []
+    n_clusters = min(5, len(history) // 2)
+    if n_clusters > 1:
+        kmeans = KMeans(n_clusters=n_clusters, random_state=42)
+        kmeans.fit(X)
+        kmeans.predict(X)
+        unique_queries = list(set(queries))
+        for i in range(n_clusters):
+            cluster_queries = [q for q in unique_queries
+                               if kmeans.predict(vectorizer.transform([q]))[0] == i]
+            if cluster_queries:
+                query_counts = {q: queries.count(q) for q in cluster_queries}
+                common_queries.append(max(query_counts.items(), key=lambda x: x[1])[0])
+    return vectorizer, common_queries
+
+
+def new_train(history, workdir):
+    chatbot = PredictiveChatbot(model_path=os.path.join(workdir, 'model.pkl'),
+                                data_path=os.path.join(workdir, 'history.csv'),
+                                db_path=':memory:')
+    for query, destination, count in history.itertuples(index=False):
+        chatbot.history.increment(query, destination, int(count))
+    # Time only training, not the pickle and CSV export
+    chatbot.save_resources = lambda: None
+    start = time.perf_counter()
+    chatbot.train_model()
+    return time.perf_counter() - start, chatbot
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000')
+    parser.add_argument('--legacy-max', type=int, default=20000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_training_')
+    # Import sklearn up front so neither side is charged for it
+    import sklearn.cluster, sklearn.feature_extraction.text, sklearn.neighbors
+    print(f"{'rows':>9}{'weighted':>11}{'old s':>9}{'new s':>9}{'speedup':>9}  same vocab/idf")
+    for size in (int(s) for s in args.sizes.split(',')):
+        history = synthetic_history(size)
+        new_seconds, chatbot = new_train(history, workdir)
+        old_seconds, same = None, ''
+        if len(history) <= args.legacy_max:
+            start = time.perf_counter()
+            vectorizer, _ = legacy_train(history)
+            old_seconds = time.perf_counter() - start
+            same = (list(vectorizer.get_feature_names_out()) == list(chatbot.vectorizer.get_feature_names_out())
+                    and np.allclose(vectorizer.idf_, chatbot.vectorizer.idf_))
+        old_text = f"{old_seconds:>9.2f}" if old_seconds is not None else f"{'-':>9}"
+        speedup = f"{old_seconds / new_seconds:>8.1f}x" if old_seconds is not None else f"{'-':>9}"
+        print(f"{len(history):>9}{int(history['count'].sum()):>11}{old_text}{new_seconds:>9.2f}{speedup}  {same}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,12 @@
 import streamlit as st
-from predictive_chatbot import PredictiveChatbot
+from streamlit.errors import StreamlitAPIException
+from predictive_chatbot import ONLINE_TRAINING, PredictiveChatbot
 
 # Initialize the predictive chatbot
 @st.cache_resource
 def get_predictive_chatbot():
     """Create or load the predictive chatbot instance (cached for efficiency)"""
-    return PredictiveChatbot()
+    return PredictiveChatbot(online=ONLINE_TRAINING)
 
 def initialize_chatbot_state():
     """Initialize the chatbot-related state variables if they don't exist"""
@@ -17,6 +18,9 @@ def initialize_chatbot_state():
         
     if "last_destination" not in st.session_state:
         st.session_state.last_destination = None
+    
+    if "also_asked" not in st.session_state:
+        st.session_state.also_asked = []
 
 def update_suggestions(destination=None):
     """Update the suggested queries based on the destination"""
@@ -33,45 +37,63 @@ def update_suggestions(destination=None):
 def record_user_query(query, destination=None):
     """Record a user query to the chatbot model"""
     chatbot = st.session_state.predictive_chatbot
+    # Recording is O(1); the shared chatbot's trainer thread updates the model
     chatbot.record_query(query, destination)
     
-    # Periodically train the model (every 10 queries)
-    queries_count = len(chatbot.search_history)
-    if queries_count % 10 == 0:
+    # Without online training, periodically retrain in batch (every 10 queries)
+    if chatbot.trainer is None and len(chatbot.history) % 10 == 0:
         chatbot.train_model()
+    
+    # Past questions like this one, offered as "people also asked"
+    st.session_state.also_asked = [similar for _, similar in chatbot.similar_queries(query, destination, k=3)]
+
+def rerun_pane():
+    """Rerun only the current fragment, or the whole app outside a fragment rerun"""
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+def ask_suggested_query(query, respond):
+    """Answer a clicked suggestion like a typed question"""
+    # When button is clicked, add this query to chat history
+    st.session_state.chat_history.append(("You", query))
+    
+    # Process the query
+    try:
+        # Get destination from session state
+        destination = st.session_state.last_destination
+        
+        # Get chatbot response
+        response = respond(query, destination)
+        
+        # Add response to chat history
+        st.session_state.chat_history.append(("Bot", response))
+        
+        # Record this query for machine learning
+        record_user_query(query, destination)
+    except Exception as e:
+        error_message = f"I'm sorry, I encountered an error processing your request: {str(e)}"
+        st.session_state.chat_history.append(("Bot", error_message))
+    
+    # Force a rerun to update the displayed chat
+    rerun_pane()
 
-def create_chatbot_suggestion_buttons(container):
-    """Create buttons for suggested queries in the given container"""
+def create_chatbot_suggestion_buttons(container, respond):
+    """Create buttons for suggested and similar past queries; respond(query, destination) answers them"""
     if st.session_state.suggested_queries:
         container.markdown("#### Suggested Questions:")
         
         # Create a button for each suggested query
         for query in st.session_state.suggested_queries:
             if container.button(query, key=f"suggest_{query}"):
-                # When button is clicked, add this query to chat history
-                st.session_state.chat_history.append(("You", query))
-                
-                # Process the query
-                try:
-                    # Get destination from session state
-                    destination = st.session_state.last_destination
-                    
-                    # Get chatbot response (using your existing chatbot_response function)
-                    # This assumes your chatbot_response function is imported here
-                    from main import chatbot_response
-                    response = chatbot_response(query, destination)
-                    
-                    # Add response to chat history
-                    st.session_state.chat_history.append(("Bot", response))
-                    
-                    # Record this query for machine learning
-                    record_user_query(query, destination)
-                except Exception as e:
-                    error_message = f"I'm sorry, I encountered an error processing your request: {str(e)}"
-                    st.session_state.chat_history.append(("Bot", error_message))
-                
-                # Force a rerun to update the displayed chat
-                st.rerun()
+                ask_suggested_query(query, respond)
+    
+    if st.session_state.get("also_asked"):
+        container.markdown("#### People Also Asked:")
+        for query in st.session_state.also_asked:
+            if container.button(query, key=f"also_{query}"):
+                ask_suggested_query(query, respond)
 
 # Function to process user input from chatbot form
 def process_user_input(user_input, destination=None):
@@ -0,0 +1,136 @@
+import calendar
+import datetime
+import os
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from response_cache import default_cache, make_key, MISSING
+
+# Amadeus self-service test keys allow about 10 requests per second; stay
+# below that so the calendar never trips 429s for the rest of the app
+FARE_CALENDAR_RATE = float(os.getenv("FARE_CALENDAR_RATE", "5"))
+FARE_CALENDAR_BURST = int(os.getenv("FARE_CALENDAR_BURST", "5"))
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Thread-safe token-bucket rate limiter"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# One limiter and pool per process, shared by every session's calendar
+default_limiter = TokenBucket(FARE_CALENDAR_RATE, FARE_CALENDAR_BURST)
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="fares")
+
+
+def window_dates(center, days):
+    """Dates within +/- `days` of `center`, skipping days in the past"""
+    today = datetime.date.today()
+    dates = [center + datetime.timedelta(days=offset) for offset in range(-days, days + 1)]
+    return [d for d in dates if d >= today]
+
+
+def month_dates(day):
+    """Remaining dates of the month containing `day`"""
+    today = datetime.date.today()
+    last = calendar.monthrange(day.year, day.month)[1]
+    dates = [datetime.date(day.year, day.month, n) for n in range(1, last + 1)]
+    return [d for d in dates if d >= today]
+
+
+def _cheapest(offers):
+    """Summarize the cheapest offer of one day's results"""
+    if not offers or isinstance(offers, dict):
+        return None
+    best = min(offers, key=lambda offer: float(offer['price']['total']))
+    segments = best['itineraries'][0]['segments']
+    carriers = best.get('validatingAirlineCodes') or [segments[0].get('carrierCode', '')]
+    return {
+        'price': float(best['price']['total']),
+        'carrier': carriers[0],
+        'stops': len(segments) - 1,
+    }
+
+
+def fare_calendar(fetch_offers, origin, destination, dates, limiter=None, cache=None):
+    """Cheapest fare per day for a route, as a DataFrame indexed by date.
+
+    `fetch_offers(origin, destination, 'YYYY-MM-DD')` is the flight-offer
+    search to use. Days already in the cache (for example from an
+    overlapping window, or in `fetch_offers`' own @cached store) cost no
+    request; the rest are fetched concurrently under the token-bucket
+    limiter. Days without offers have a NaN price; `status` tells "no
+    offers" apart from days whose search failed ("unavailable").
+    """
+    limiter = limiter or default_limiter
+    cache = cache or default_cache
+    lookup = getattr(fetch_offers, 'lookup', None)
+
+    def fetch_day(day):
+        key = make_key('fare_day', {'origin': origin, 'destination': destination, 'date': day})
+        summary = cache.get('fare_day', key)
+        if summary is not MISSING:
+            return day, summary, 'ok' if summary else 'no offers'
+        args = (origin, destination, day.strftime("%Y-%m-%d"))
+        try:
+            offers = lookup(*args) if lookup else MISSING
+            if offers is MISSING:
+                limiter.acquire()
+                offers = fetch_offers.refresh(*args) if lookup else fetch_offers(*args)
+            summary = _cheapest(offers)
+        except Exception as e:
+            logger.warning("Fare search for %s failed: %s", day, e)
+            return day, None, 'unavailable'
+        # Failed days are retried next time instead of cached as empty
+        if isinstance(offers, dict):
+            return day, None, 'unavailable'
+        cache.set('fare_day', key, summary)
+        return day, summary, 'ok' if summary else 'no offers'
+
+    rows = []
+    for day, summary, status in _executor.map(fetch_day, dates):
+        summary = summary or {'price': float('nan'), 'carrier': None, 'stops': None}
+        rows.append({'date': day, **summary, 'status': status})
+
+    frame = pd.DataFrame(rows, columns=['date', 'price', 'carrier', 'stops', 'status'])
+    return frame.set_index('date')
+
+
+def calendar_grid(fares):
+    """Pivot a fare_calendar result into a week-by-weekday price matrix"""
+    if fares.empty:
+        return pd.DataFrame()
+    dates = pd.to_datetime(pd.Series(fares.index))
+    grid = pd.DataFrame({
+        # Each row is labelled by the Monday that starts its week
+        'week_of': (dates - pd.to_timedelta(dates.dt.weekday, unit='D')).dt.date,
+        'weekday': dates.dt.strftime('%a'),
+        'price': fares['price'].to_numpy(),
+    })
+    matrix = grid.pivot(index='week_of', columns='weekday', values='price')
+    weekdays = [d for d in ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'] if d in matrix.columns]
+    return matrix[weekdays]
@@ -0,0 +1,109 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ['price', 'duration', 'stops', 'carrier', 'departure', 'arrival', 'route', 'segments']
+
+_DURATION = re.compile(r'PT(?:(\d+)H)?(?:(\d+)M)?')
+
+
+def parse_duration(value):
+    """Convert an ISO 8601 duration like 'PT5H30M' to minutes"""
+    match = _DURATION.fullmatch(value or '')
+    if not match:
+        return np.nan
+    hours, minutes = match.groups()
+    return int(hours or 0) * 60 + int(minutes or 0)
+
+
+def offers_to_frame(offers):
+    """Flatten Amadeus flight offers into one row per offer.
+
+    Only the outbound itinerary is used. Numeric columns (price, duration in
+    minutes, stops) and datetime columns (departure, arrival) are plain
+    arrays so sorting and filtering never walk the nested JSON again. The
+    `segments` column keeps (flight number, from, to, departs, arrives)
+    tuples for display.
+    """
+    rows = []
+    for offer in offers:
+        itinerary = offer['itineraries'][0]
+        segments = itinerary['segments']
+        rows.append((
+            float(offer['price']['total']),
+            parse_duration(itinerary.get('duration')),
+            len(segments) - 1,
+            (offer.get('validatingAirlineCodes') or [segments[0].get('carrierCode', '')])[0],
+            segments[0]['departure']['at'],
+            segments[-1]['arrival']['at'],
+            ' → '.join([segments[0]['departure']['iataCode']] + [s['arrival']['iataCode'] for s in segments]),
+            tuple(
+                (
+                    f"{s.get('carrierCode', '')}{s.get('number', '')}",
+                    s['departure']['iataCode'],
+                    s['arrival']['iataCode'],
+                    s['departure']['at'],
+                    s['arrival']['at'],
+                )
+                for s in segments
+            ),
+        ))
+
+    frame = pd.DataFrame.from_records(rows, columns=COLUMNS)
+    frame['departure'] = pd.to_datetime(frame['departure'])
+    frame['arrival'] = pd.to_datetime(frame['arrival'])
+    frame['price'] = frame['price'].astype('float64')
+    frame['duration'] = frame['duration'].astype('float64')
+    frame['stops'] = frame['stops'].astype('int16')
+    frame['carrier'] = frame['carrier'].astype('category')
+    return frame
+
+
+def filter_offers(frame, max_price=None, max_stops=None, max_duration=None,
+                  depart_after=None, depart_before=None, carriers=None):
+    """Return the offers matching every given limit.
+
+    `depart_after`/`depart_before` are hours of the day (e.g. 6.5 for 06:30).
+    """
+    mask = np.ones(len(frame), dtype=bool)
+    if max_price is not None:
+        mask &= frame['price'].to_numpy() <= max_price
+    if max_stops is not None:
+        mask &= frame['stops'].to_numpy() <= max_stops
+    if max_duration is not None:
+        mask &= frame['duration'].to_numpy() <= max_duration
+    if depart_after is not None or depart_before is not None:
+        hours = (frame['departure'].dt.hour + frame['departure'].dt.minute / 60).to_numpy()
+        if depart_after is not None:
+            mask &= hours >= depart_after
+        if depart_before is not None:
+            mask &= hours <= depart_before
+    if carriers:
+        mask &= frame['carrier'].isin(carriers).to_numpy()
+    return frame[mask]
+
+
+def sort_offers(frame, by='price'):
+    """Sort by one of price, duration, stops or departure, cheapest first on ties"""
+    keys = [by] if by == 'price' else [by, 'price']
+    return frame.sort_values(keys, kind='stable')
+
+
+def pareto_front(frame, columns=('price', 'duration', 'stops')):
+    """Boolean mask of offers no other offer beats on every column.
+
+    An offer is dropped only if another one is at least as good on price,
+    duration and stops and strictly better on at least one of them.
+    """
+    values = frame[list(columns)].to_numpy(dtype=float)
+    values = np.where(np.isnan(values), np.inf, values)
+    dominated = np.zeros(len(values), dtype=bool)
+    # Compare in blocks so memory stays O(block * n) for large result pages
+    block = 256
+    for start in range(0, len(values), block):
+        chunk = values[start:start + block]
+        no_worse = (values[None, :, :] <= chunk[:, None, :]).all(axis=2)
+        better = (values[None, :, :] < chunk[:, None, :]).any(axis=2)
+        dominated[start:start + block] = (no_worse & better).any(axis=1)
+    return ~dominated
@@ -0,0 +1,111 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+# Kilometres per unit of the hotel API's distance field
+DISTANCE_UNITS_KM = {'KM': 1.0, 'M': 0.001, 'MILE': 1.609344, 'MILES': 1.609344, 'MI': 1.609344}
+
+
+def _coordinates(records, lat_key, lon_key):
+    """Split records into those with coordinates and an (n, 2) radians array"""
+    kept = []
+    coords = []
+    for record in records:
+        lat, lon = lat_key(record), lon_key(record)
+        if lat is None or lon is None:
+            continue
+        kept.append(record)
+        coords.append((lat, lon))
+    return kept, np.radians(np.array(coords, dtype=float).reshape(-1, 2))
+
+
+class GeoIndex:
+    """Haversine ball tree over a list of records with coordinates"""
+
+    def __init__(self, records, lat_key, lon_key):
+        self.records, coords = _coordinates(records, lat_key, lon_key)
+        # sklearn takes a second to import; load it with the first index
+        from sklearn.neighbors import BallTree
+        self.tree = BallTree(coords, metric='haversine') if len(coords) else None
+
+    def __len__(self):
+        return len(self.records)
+
+    def within(self, lat, lon, radius_km):
+        """Records within `radius_km` of a point, nearest first, as (record, km) pairs"""
+        if self.tree is None:
+            return []
+        point = np.radians([[lat, lon]])
+        indices, distances = self.tree.query_radius(
+            point, r=radius_km / EARTH_RADIUS_KM, return_distance=True, sort_results=True
+        )
+        return [(self.records[i], d * EARTH_RADIUS_KM) for i, d in zip(indices[0], distances[0])]
+
+    def nearest(self, lat, lon, n=5):
+        """The `n` records closest to a point, as (record, km) pairs"""
+        if self.tree is None:
+            return []
+        n = min(n, len(self.records))
+        distances, indices = self.tree.query(np.radians([[lat, lon]]), k=n)
+        return [(self.records[i], d * EARTH_RADIUS_KM) for i, d in zip(indices[0], distances[0])]
+
+
+def _center_km(hotel):
+    """A hotel's distance from the city center in km, or inf if unknown"""
+    distance = hotel.get('distance') or {}
+    value = distance.get('value')
+    # Amadeus reports KM unless the search asked for miles
+    factor = DISTANCE_UNITS_KM.get(str(distance.get('unit') or 'KM').upper())
+    if value is None or factor is None:
+        return np.inf
+    return float(value) * factor
+
+
+def _hotel_lat(hotel):
+    return (hotel.get('geoCode') or {}).get('latitude')
+
+
+def _hotel_lon(hotel):
+    return (hotel.get('geoCode') or {}).get('longitude')
+
+
+class DestinationGeo:
+    """Spatial lookups over one destination's hotels and attractions.
+
+    Built once per search from the already-fetched results, so radius and
+    "near this attraction" changes are answered locally instead of
+    re-querying the hotel API.
+    """
+
+    def __init__(self, hotels, attractions):
+        self.hotels = GeoIndex(hotels, _hotel_lat, _hotel_lon)
+        self.attractions = GeoIndex(
+            attractions or [], lambda a: a.get('lat'), lambda a: a.get('lng')
+        )
+        # Distance from the city center as reported by the hotel API
+        self.center_km = np.array([_center_km(hotel) for hotel in hotels], dtype=float)
+        self._all_hotels = hotels
+
+    def hotels_near_center(self, radius_km):
+        """Hotels within `radius_km` of the city center, nearest first"""
+        inside = np.flatnonzero(self.center_km <= radius_km)
+        inside = inside[np.argsort(self.center_km[inside], kind='stable')]
+        return [(self._all_hotels[i], self.center_km[i]) for i in inside]
+
+    def hotels_near(self, lat, lon, radius_km):
+        return self.hotels.within(lat, lon, radius_km)
+
+    def nearest_hotels(self, lat, lon, n=5):
+        return self.hotels.nearest(lat, lon, n)
+
+    def attraction(self, name):
+        for attraction in self.attractions.records:
+            if attraction['name'] == name:
+                return attraction
+        return None
+
+    def hotels_near_attraction(self, name, radius_km):
+        """Hotels within `radius_km` of the named attraction, nearest first"""
+        attraction = self.attraction(name)
+        if attraction is None:
+            return []
+        return self.hotels_near(attraction['lat'], attraction['lng'], radius_km)
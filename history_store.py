@@ -0,0 +1,139 @@
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+# Pending count changes are written at most this often, or sooner once
+# this many (query, destination) pairs have changed
+FLUSH_SECONDS = float(os.getenv("HISTORY_FLUSH_SECONDS", "5"))
+FLUSH_BATCH = int(os.getenv("HISTORY_FLUSH_BATCH", "100"))
+
+COLUMNS = ['query', 'destination', 'count']
+
+logger = logging.getLogger(__name__)
+
+
+def _destination(value):
+    # CSV round trips turn a missing destination into NaN
+    if value is None or (isinstance(value, float) and value != value) or value == '':
+        return None
+    return value
+
+
+class SearchHistoryStore:
+    """Query counts keyed by (query, destination), persisted to SQLite.
+
+    Counts live in a dict, so recording a query is one hash lookup. The
+    increments since the last flush are added to the stored counts in
+    batches by a background flusher instead of rewriting the whole history
+    on every query, so processes sharing the database don't overwrite each
+    other's counts. `frame()` gives the
+    DataFrame view the model code works with and is rebuilt only after
+    the counts changed.
+    """
+
+    def __init__(self, db_path, flush_seconds=FLUSH_SECONDS, flush_batch=FLUSH_BATCH):
+        self.db_path = db_path
+        self.flush_batch = flush_batch
+        self._lock = threading.Lock()
+        self._counts = {}
+        # (query, destination) -> amount added since the last flush
+        self._pending = {}
+        self._version = 0
+        self._frame = None
+        self._frame_version = -1
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS history ("
+            " query TEXT NOT NULL, destination TEXT NOT NULL, count INTEGER NOT NULL,"
+            " PRIMARY KEY (query, destination))"
+        )
+        self._db.commit()
+        # rowid keeps first-seen order, like the old CSV rows
+        for query, destination, count in self._db.execute(
+                "SELECT query, destination, count FROM history ORDER BY rowid"):
+            self._counts[(query, destination or None)] = count
+        self._wake = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, args=(flush_seconds,),
+                                         daemon=True, name="history-flush")
+        self._flusher.start()
+        atexit.register(self.flush)
+
+    def __len__(self):
+        return len(self._counts)
+
+    def increment(self, query, destination=None, amount=1):
+        """Add to a query's count; returns the new count"""
+        key = (query, _destination(destination))
+        with self._lock:
+            count = self._counts.get(key, 0) + amount
+            self._counts[key] = count
+            self._pending[key] = self._pending.get(key, 0) + amount
+            self._version += 1
+            pending = len(self._pending)
+        if pending >= self.flush_batch:
+            self._wake.set()
+        return count
+
+    def count(self, query, destination=None):
+        with self._lock:
+            return self._counts.get((query, _destination(destination)), 0)
+
+    def items(self):
+        """Snapshot of ((query, destination), count) pairs in first-seen order"""
+        with self._lock:
+            return list(self._counts.items())
+
+    def frame(self):
+        """The history as a DataFrame with query, destination and count columns"""
+        with self._lock:
+            if self._frame_version != self._version:
+                rows = [(query, destination, count) for (query, destination), count in self._counts.items()]
+                self._frame = pd.DataFrame(rows, columns=COLUMNS)
+                self._frame_version = self._version
+            return self._frame
+
+    def flush(self):
+        """Add pending increments to the stored counts in one transaction"""
+        with self._lock:
+            if not self._pending:
+                return 0
+            rows = [(query, destination or '', amount)
+                    for (query, destination), amount in self._pending.items()]
+            try:
+                self._db.executemany(
+                    "INSERT INTO history (query, destination, count) VALUES (?, ?, ?) "
+                    "ON CONFLICT (query, destination) DO UPDATE SET count = count + excluded.count",
+                    rows,
+                )
+                self._db.commit()
+            except sqlite3.Error:
+                # Keep the increments for the next attempt
+                self._db.rollback()
+                raise
+            self._pending.clear()
+        return len(rows)
+
+    def _flush_loop(self, interval):
+        while True:
+            self._wake.wait(interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                logger.warning("Error flushing search history: %s", e)
+
+    def import_csv(self, path):
+        """Add the counts from a search_history.csv export"""
+        data = pd.read_csv(path)
+        for query, destination, count in data[COLUMNS].itertuples(index=False):
+            self.increment(query, destination, int(count))
+        self.flush()
+        return len(data)
+
+    def export_csv(self, path):
+        """Write the history in the search_history.csv layout"""
+        self.frame().to_csv(path, index=False)
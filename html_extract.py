@@ -0,0 +1,123 @@
+import codecs
+from html.parser import HTMLParser
+
+# Stop downloading a page after this many bytes
+MAX_PAGE_BYTES = 256 * 1024
+# Enough paragraph text for one snippet
+SNIPPET_LENGTH = 300
+# Paragraph text shorter than this is not a usable snippet
+MIN_CONTENT_LENGTH = 50
+MAX_PARAGRAPHS = 3
+
+# Text inside these tags is never shown to readers
+_SKIP_TAGS = {'script', 'style', 'noscript', 'template', 'svg', 'iframe'}
+# Block elements that implicitly close an open <p>
+_BLOCK_TAGS = {'div', 'section', 'article', 'main', 'header', 'footer', 'nav', 'aside',
+               'ul', 'ol', 'table', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote'}
+
+
+def normalize_whitespace(text):
+    """Collapse every run of whitespace into one space in a single pass"""
+    return ' '.join(text.split())
+
+
+class _SnippetParser(HTMLParser):
+    """Incremental parser that keeps only the title, paragraphs and some body text"""
+
+    def __init__(self, snippet_length, body_limit):
+        super().__init__()
+        self.snippet_length = snippet_length
+        self.body_limit = body_limit
+        self.title = []
+        self.paragraphs = []
+        self.paragraph_length = 0
+        self.body = []
+        self.body_length = 0
+        self.done = False
+        self._skip = 0
+        self._in_title = False
+        self._paragraph = None
+
+    def _close_paragraph(self):
+        if self._paragraph is None:
+            return
+        text = normalize_whitespace(''.join(self._paragraph))
+        self._paragraph = None
+        if text:
+            self.paragraphs.append(text)
+            self.paragraph_length += len(text) + 1
+            if len(self.paragraphs) >= MAX_PARAGRAPHS or self.paragraph_length >= self.snippet_length:
+                self.done = True
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TAGS:
+            self._skip += 1
+        elif tag == 'title':
+            self._in_title = True
+        elif tag == 'p':
+            self._close_paragraph()
+            self._paragraph = []
+        elif tag in _BLOCK_TAGS:
+            self._close_paragraph()
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif tag == 'title':
+            self._in_title = False
+        elif tag == 'p' or tag in _BLOCK_TAGS or tag == 'body':
+            self._close_paragraph()
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        if self._in_title:
+            self.title.append(data)
+            return
+        if self._paragraph is not None:
+            self._paragraph.append(data)
+        # Fallback text for pages without usable paragraphs
+        if self.body_length < self.body_limit and data.strip():
+            self.body.append(data)
+            self.body_length += len(data)
+
+
+def extract_snippet(chunks, snippet_length=SNIPPET_LENGTH):
+    """Return (title, content) from an iterable of HTML text chunks.
+
+    Parsing stops as soon as enough paragraph text has been seen, so the
+    rest of the page is never read. Pages without usable paragraphs fall
+    back to the first few kilobytes of visible body text.
+    """
+    parser = _SnippetParser(snippet_length, body_limit=snippet_length * 8)
+    for chunk in chunks:
+        parser.feed(chunk)
+        if parser.done:
+            break
+    else:
+        parser.close()
+        parser._close_paragraph()
+
+    title = normalize_whitespace(''.join(parser.title)) or "No title available"
+    content = ' '.join(parser.paragraphs)
+    if len(content) < MIN_CONTENT_LENGTH:
+        content = normalize_whitespace(' '.join(parser.body))
+    return title, content
+
+
+def iter_response_text(response, max_bytes=MAX_PAGE_BYTES, chunk_size=16 * 1024):
+    """Decode a streamed `requests` response chunk by chunk, stopping at `max_bytes`"""
+    content_type = response.headers.get('Content-Type', '').lower()
+    # requests assumes ISO-8859-1 for text/* without a charset; most pages are UTF-8
+    encoding = response.encoding if 'charset' in content_type and response.encoding else 'utf-8'
+    try:
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    except LookupError:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    received = 0
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        received += len(chunk)
+        yield decoder.decode(chunk)
+        if received >= max_bytes:
+            return
+    yield decoder.decode(b'', final=True)
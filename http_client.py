@@ -0,0 +1,249 @@
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+# Defaults can be tuned per deployment through the environment
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "15"))
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+
+# Upstream endpoints the app calls, for metrics and replay; any other URL
+# is a web search result page
+ENDPOINTS = {
+    ('test.api.amadeus.com', '/v1/security/oauth2/token'): 'token',
+    ('test.api.amadeus.com', '/v1/reference-data/locations'): 'locations',
+    ('test.api.amadeus.com', '/v2/shopping/flight-offers'): 'flight_offers',
+    ('test.api.amadeus.com', '/v1/reference-data/locations/hotels/by-city'): 'hotels',
+    ('test.api.amadeus.com', '/v3/shopping/hotel-offers'): 'hotel_offers',
+    ('maps.googleapis.com', '/maps/api/place/textsearch/json'): 'places',
+    ('www.google.com', '/search'): 'search',
+}
+
+# Status codes worth retrying: rate limiting and transient upstream errors
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Per-thread time.monotonic() deadline set by `deadline`
+_local = threading.local()
+
+
+@contextmanager
+def deadline(seconds):
+    """Bound every request the calling thread makes in the block to `seconds` from now.
+
+    Timeouts are cut to the time left and no retry or backoff runs past
+    it, so a slow upstream cannot hold the thread longer. Nested blocks
+    keep the earlier deadline.
+    """
+    previous = getattr(_local, 'deadline', None)
+    end = time.monotonic() + seconds
+    _local.deadline = end if previous is None else min(previous, end)
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+def _time_left():
+    end = getattr(_local, 'deadline', None)
+    return None if end is None else end - time.monotonic()
+
+
+def _capped(timeout, left):
+    if timeout is None:
+        return left
+    if isinstance(timeout, tuple):
+        return tuple(left if t is None else min(t, left) for t in timeout)
+    return min(timeout, left)
+
+
+def endpoint_of(url):
+    parts = urlsplit(url)
+    return ENDPOINTS.get((parts.netloc, parts.path), 'page')
+
+
+class HttpClient:
+    """Shared HTTP transport with per-host keep-alive pools, timeouts and retries.
+
+    Each host gets its own `requests.Session` so TCP/TLS connections are
+    reused across calls and Streamlit sessions. Failed requests (connection
+    errors, timeouts, 429 and 5xx responses) are retried with jittered
+    exponential backoff.
+    """
+
+    def __init__(self, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 max_retries=MAX_RETRIES, pool_size=POOL_SIZE,
+                 backoff_base=0.5, backoff_max=8.0, max_hosts=64):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.pool_size = pool_size
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_hosts = max_hosts
+        # Transport shared by every host instead of a live pool (see replay.py)
+        self.adapter = None
+        self._sessions = OrderedDict()
+        # In-flight requests per session; an evicted session is closed
+        # only once its last request is done
+        self._users = {}
+        self._evicted = set()
+        self._lock = threading.Lock()
+
+    def _session(self, url):
+        """Check out the pooled session for the URL's host; pair with `_release`"""
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is not None:
+                self._sessions.move_to_end(host)
+                self._users[session] += 1
+                return session
+            session = requests.Session()
+            # Retries are handled in request() so they can use jittered backoff
+            adapter = self.adapter or HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+            session.mount(host, adapter)
+            self._sessions[host] = session
+            self._users[session] = 1
+            # Page fetches hit arbitrary hosts, so keep only the most recent ones
+            while len(self._sessions) > self.max_hosts:
+                _, old = self._sessions.popitem(last=False)
+                if self._users[old] == 0:
+                    del self._users[old]
+                    old.close()
+                else:
+                    self._evicted.add(old)
+            return session
+
+    def _release(self, session):
+        with self._lock:
+            if session not in self._users:
+                # close() already closed it
+                return
+            self._users[session] -= 1
+            if self._users[session] == 0 and session in self._evicted:
+                self._evicted.discard(session)
+                del self._users[session]
+                session.close()
+
+    def _backoff(self, attempt, response=None):
+        """Seconds to wait before the next attempt (full jitter, honours Retry-After)"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def request(self, method, url, retries=None, **kwargs):
+        """Send a request through the host's pool, retrying transient failures.
+
+        The latency recorded includes retries and backoff: the time the
+        caller waited. A streamed response is timed until it is closed, so
+        reading the body counts too.
+        """
+        endpoint = endpoint_of(url)
+        start = time.perf_counter()
+        try:
+            response = self._request(method, url, retries, **kwargs)
+        except Exception:
+            metrics.inc('upstream_errors_total', endpoint=endpoint)
+            metrics.observe('upstream_seconds', time.perf_counter() - start, endpoint=endpoint)
+            raise
+        if response.status_code >= 400:
+            metrics.inc('upstream_errors_total', endpoint=endpoint)
+        if kwargs.get('stream'):
+            response.close = self._timed_close(response.close, start, endpoint)
+        else:
+            metrics.observe('upstream_seconds', time.perf_counter() - start, endpoint=endpoint)
+        return response
+
+    def _timed_close(self, close, start, endpoint):
+        observed = False
+
+        def timed_close():
+            nonlocal observed
+            if not observed:
+                observed = True
+                metrics.observe('upstream_seconds', time.perf_counter() - start, endpoint=endpoint)
+            close()
+        return timed_close
+
+    def _request(self, method, url, retries, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        retries = self.max_retries if retries is None else retries
+        session = self._session(url)
+        try:
+            attempt = 0
+            timeout = kwargs['timeout']
+            while True:
+                left = _time_left()
+                if left is not None:
+                    if left <= 0:
+                        raise requests.Timeout(f"Deadline passed before requesting {url}")
+                    kwargs['timeout'] = _capped(timeout, left)
+                try:
+                    response = session.request(method, url, **kwargs)
+                except (requests.ConnectionError, requests.Timeout):
+                    delay = self._backoff(attempt)
+                    if attempt >= retries or not self._fits(delay):
+                        raise
+                    time.sleep(delay)
+                else:
+                    if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                        return response
+                    delay = self._backoff(attempt, response)
+                    if not self._fits(delay):
+                        return response
+                    response.close()
+                    time.sleep(delay)
+                metrics.inc('upstream_retries_total', endpoint=endpoint_of(url))
+                attempt += 1
+        finally:
+            self._release(session)
+
+    @staticmethod
+    def _fits(delay):
+        """Whether a retry after `delay` seconds still starts before the thread's deadline"""
+        left = _time_left()
+        return left is None or delay < left
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._users.clear()
+            self._evicted.clear()
+
+
+# Process-wide client shared by every API function
+default_client = HttpClient()
+
+# HTTP_REPLAY_DIR serves recorded responses instead of calling upstream;
+# HTTP_RECORD_DIR records live responses there for later replay
+if os.getenv("HTTP_REPLAY_DIR") is not None or os.getenv("HTTP_RECORD_DIR"):
+    import replay
+    replay.install_from_env(default_client)
+
+
+def get(url, **kwargs):
+    return default_client.get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    return default_client.post(url, **kwargs)
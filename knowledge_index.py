@@ -0,0 +1,236 @@
+import json
+import logging
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import metrics
+
+# Relative score (0-1) the best hit needs before the chatbot answers
+# from the index instead of searching the web
+MIN_RELATIVE_SCORE = float(os.getenv("KNOWLEDGE_MIN_SCORE", "0.5"))
+INDEX_PATH = os.getenv("KNOWLEDGE_INDEX_PATH", "knowledge_index.json")
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+_STOPWORDS = {
+    'a', 'an', 'and', 'are', 'about', 'as', 'at', 'be', 'by', 'can', 'do', 'for', 'from',
+    'how', 'i', 'in', 'is', 'it', 'me', 'more', 'my', 'of', 'on', 'or', 'tell', 'that',
+    'the', 'there', 'this', 'to', 'was', 'what', 'when', 'where', 'which', 'who', 'with', 'you',
+}
+
+logger = logging.getLogger(__name__)
+
+
+def tokenize(text):
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def _destination_key(destination):
+    return ' '.join(destination.casefold().split()) if destination else None
+
+
+class KnowledgeIndex:
+    """BM25 inverted index over travel snippets the app has already fetched.
+
+    Documents are title/link/snippet dicts tagged with a destination. Adding
+    a link that is already indexed replaces the old document; replaced
+    documents are only marked deleted and dropped from the postings by
+    `compact`, which runs automatically once a quarter of them are stale.
+    Every `autosave_every` additions the index is saved by a background
+    saver, so requests that add documents never wait for the write.
+    """
+
+    def __init__(self, path=None, k1=1.5, b=0.75, autosave_every=20):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.autosave_every = autosave_every
+        self._lock = threading.Lock()
+        # Serializes saves so an older snapshot never replaces a newer one
+        self._save_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._saver = None
+        self._reset()
+        self._query_count = 0
+        self._query_seconds = 0.0
+        if path and os.path.exists(path):
+            self.load()
+
+    def _reset(self):
+        self.docs = []
+        self.doc_lengths = []
+        self.postings = {}
+        self.by_link = {}
+        self.deleted = set()
+        self.total_length = 0
+        self._unsaved = 0
+
+    def _live_count(self):
+        return len(self.docs) - len(self.deleted)
+
+    def _add(self, doc):
+        link = doc.get('link')
+        if link in self.by_link:
+            old = self.by_link[link]
+            self.deleted.add(old)
+            self.total_length -= self.doc_lengths[old]
+        doc_id = len(self.docs)
+        terms = Counter(tokenize(f"{doc['title']} {doc['snippet']}"))
+        self.docs.append(doc)
+        self.doc_lengths.append(sum(terms.values()))
+        self.total_length += self.doc_lengths[-1]
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        if link:
+            self.by_link[link] = doc_id
+
+    def add(self, title, link, snippet, destination=None):
+        """Index one document, replacing any earlier one with the same link"""
+        doc = {'title': title, 'link': link, 'snippet': snippet,
+               'destination': _destination_key(destination)}
+        with self._lock:
+            self._add(doc)
+            self._unsaved += 1
+            if len(self.deleted) > len(self.docs) // 4:
+                self._compact()
+            should_save = self.path and self._unsaved >= self.autosave_every
+            if should_save and self._saver is None:
+                self._saver = threading.Thread(target=self._save_loop, daemon=True,
+                                               name="knowledge-save")
+                self._saver.start()
+        if should_save:
+            self._wake.set()
+
+    def _save_loop(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                self.save()
+            except (OSError, TypeError, ValueError) as e:
+                logger.warning("Could not save the knowledge index: %s", e)
+
+    def add_results(self, results, destination=None):
+        """Index web_search results, skipping pages that could not be read"""
+        for result in results:
+            if result['title'] in ("Could not fetch page", "Unable to process page"):
+                continue
+            self.add(result['title'], result['link'], result['snippet'], destination)
+
+    def add_attractions(self, attractions, destination):
+        """Index Google Places attraction records for a destination"""
+        for attraction in attractions:
+            snippet = (f"{attraction['name']} is one of the top attractions in {destination}, "
+                       f"rated {attraction['rating']}. Address: {attraction['address']}.")
+            link = f"https://www.google.com/maps/place/?q=place_id:{attraction['place_id']}"
+            self.add(attraction['name'], link, snippet, destination)
+
+    def _compact(self):
+        live = [doc for i, doc in enumerate(self.docs) if i not in self.deleted]
+        self._reset()
+        for doc in live:
+            self._add(doc)
+
+    def compact(self):
+        """Rebuild the postings without replaced documents"""
+        with self._lock:
+            self._compact()
+
+    def search(self, query, destination=None, k=3):
+        """Return up to `k` (relative score, doc) pairs, best first.
+
+        The relative score divides the BM25 score by the best score any
+        document could get for this query, so one threshold works for short
+        and long questions alike.
+        """
+        start = time.perf_counter()
+        terms = set(tokenize(query))
+        destination = _destination_key(destination)
+        with self._lock:
+            n = self._live_count()
+            if not terms or n == 0:
+                return []
+            average_length = self.total_length / n
+            scores = Counter()
+            best_possible = 0.0
+            for term in terms:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                df = len(postings)
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                best_possible += idf * (self.k1 + 1)
+                for doc_id, tf in postings.items():
+                    if doc_id in self.deleted:
+                        continue
+                    if destination and self.docs[doc_id]['destination'] != destination:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / average_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+            # Query terms never seen still count against the match
+            unseen = sum(1 for t in terms if t not in self.postings)
+            best_possible += unseen * (self.k1 + 1) * math.log(1 + (n + 0.5) / 0.5)
+            hits = [(score / best_possible, self.docs[doc_id]) for doc_id, score in scores.most_common(k)]
+            self._query_count += 1
+            self._query_seconds += time.perf_counter() - start
+        return hits
+
+    def answer(self, query, destination=None, k=3, min_score=MIN_RELATIVE_SCORE):
+        """Results good enough to answer from, or [] if the web should be searched"""
+        hits = self.search(query, destination, k)
+        if not hits or hits[0][0] < min_score:
+            return []
+        return [doc for score, doc in hits if score >= min_score / 2]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'documents': self._live_count(),
+                'deleted': len(self.deleted),
+                'terms': len(self.postings),
+                'postings': sum(len(p) for p in self.postings.values()),
+                'queries': self._query_count,
+                'avg_query_ms': 1000 * self._query_seconds / self._query_count if self._query_count else 0.0,
+            }
+
+    def save(self):
+        """Write live documents to `path` atomically; postings are rebuilt on load"""
+        with self._save_lock:
+            with self._lock:
+                live = [doc for i, doc in enumerate(self.docs) if i not in self.deleted]
+                self._unsaved = 0
+            # A temp file of its own, so other processes saving the same index don't collide
+            fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(self.path)}.",
+                                            dir=os.path.dirname(os.path.abspath(self.path)))
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(live, f)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+    def load(self):
+        with open(self.path, encoding='utf-8') as f:
+            docs = json.load(f)
+        with self._lock:
+            self._reset()
+            for doc in docs:
+                self._add(doc)
+        logger.info("Loaded %d documents into the knowledge index", len(docs))
+
+
+# Shared by every session in the process
+default_index = KnowledgeIndex(INDEX_PATH)
+
+
+def _metric_samples():
+    stats = default_index.stats()
+    return [('knowledge_index_' + name, {}, value) for name, value in stats.items()]
+
+
+metrics.register_collector('knowledge_index', _metric_samples)
@@ -0,0 +1,223 @@
+import functools
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency bucket upper bounds in seconds, Prometheus style
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, math.inf)
+
+# Serve /metrics on this port, and/or rewrite a text snapshot file periodically
+METRICS_PORT = os.getenv("METRICS_PORT")
+SNAPSHOT_PATH = os.getenv("METRICS_SNAPSHOT_PATH")
+SNAPSHOT_SECONDS = float(os.getenv("METRICS_SNAPSHOT_SECONDS", "30"))
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside the bucket that holds it"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for bound, n in zip(self.buckets, self.counts):
+            if seen + n >= rank and n:
+                if math.isinf(bound):
+                    return lower
+                return lower + (bound - lower) * (rank - seen) / n
+            seen += n
+            lower = bound
+        return lower
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in sorted(labels.items())) + '}'
+
+
+class Metrics:
+    """Process-wide registry of latency histograms, counters and collectors.
+
+    Histograms and counters are keyed by metric name and a label dict.
+    Collectors are callables registered by components that already keep
+    their own counters (caches, indexes); they are polled on export and
+    return (name, labels, value) samples.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.collectors = {}
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, name, **labels):
+        """Decorator form of `timer`"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def register_collector(self, name, collect):
+        self.collectors[name] = collect
+
+    def samples(self):
+        """Collector samples as (name, labels, value); a failing collector is skipped"""
+        samples = []
+        for name, collect in list(self.collectors.items()):
+            try:
+                samples.extend(collect())
+            except Exception as e:
+                logger.warning("Metrics collector %s failed: %s", name, e)
+        return samples
+
+    def summary(self):
+        """Rows for display: one per histogram with count, p50/p95/p99 and errors"""
+        with self._lock:
+            histograms = list(self.histograms.items())
+            counters = dict(self.counters)
+        rows = []
+        for (name, labels), histogram in sorted(histograms):
+            rows.append({
+                'metric': name,
+                **dict(labels),
+                'count': histogram.count,
+                'p50_ms': 1000 * histogram.quantile(0.5),
+                'p95_ms': 1000 * histogram.quantile(0.95),
+                'p99_ms': 1000 * histogram.quantile(0.99),
+                'errors': counters.get((name.replace('_seconds', '_errors_total'), labels), 0),
+            })
+        return rows
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            histograms = {key: (list(h.counts), h.total, h.count, h.buckets) for key, h in self.histograms.items()}
+            counters = dict(self.counters)
+        lines = []
+        typed = set()
+        for (name, labels), (counts, total, count, buckets) in sorted(histograms.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, n in zip(buckets, counts):
+                cumulative += n
+                le = '+Inf' if math.isinf(bound) else repr(bound)
+                lines.append(f"{name}_bucket{_label_text({**dict(labels), 'le': le})} {cumulative}")
+            lines.append(f"{name}_sum{_label_text(dict(labels))} {total}")
+            lines.append(f"{name}_count{_label_text(dict(labels))} {count}")
+        for (name, labels), value in sorted(counters.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_label_text(dict(labels))} {value}")
+        for name, labels, value in sorted(self.samples(), key=lambda s: (s[0], sorted(s[1].items()))):
+            if name not in typed:
+                lines.append(f"# TYPE {name} gauge")
+                typed.add(name)
+            lines.append(f"{name}{_label_text(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def write_snapshot(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+
+# Shared by every module and session in the process
+default_metrics = Metrics()
+observe = default_metrics.observe
+inc = default_metrics.inc
+timer = default_metrics.timer
+timed = default_metrics.timed
+register_collector = default_metrics.register_collector
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+        body = default_metrics.render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port):
+    """Expose /metrics for Prometheus on a background thread"""
+    server = ThreadingHTTPServer(('0.0.0.0', port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+    logger.info("Serving metrics on http://0.0.0.0:%d/metrics", port)
+    return server
+
+
+def _snapshot_loop(path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            default_metrics.write_snapshot(path)
+        except OSError as e:
+            logger.warning("Could not write metrics snapshot: %s", e)
+
+
+if METRICS_PORT:
+    try:
+        serve(int(METRICS_PORT))
+    except OSError as e:
+        # Another process (or an earlier import) already owns the port
+        logger.warning("Metrics endpoint not started: %s", e)
+if SNAPSHOT_PATH:
+    threading.Thread(target=_snapshot_loop, args=(SNAPSHOT_PATH, SNAPSHOT_SECONDS),
+                     daemon=True, name="metrics-snapshot").start()
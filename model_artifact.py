@@ -0,0 +1,356 @@
+import datetime
+import errno
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+
+import numpy as np
+
+# Bump when the manifest or array layout changes incompatibly
+SCHEMA_VERSION = 1
+FORMAT = "predictive-chatbot-model"
+# Versions kept on disk, the current one included. Pruning is safe for
+# processes using an older version: loading maps every array at once, and a
+# mapped file stays readable after it is deleted. A load that loses the race
+# with pruning retries with the new current version.
+KEEP_VERSIONS = 2
+
+_VERSION_DIR = re.compile(r'^v(\d+)$')
+_MASK32 = 0xFFFFFFFF
+
+logger = logging.getLogger(__name__)
+
+
+def _analyze(text, lowercase, token_pattern, ngram_range):
+    """Word n-grams of `text`, as scikit-learn's 'word' analyzer produces them"""
+    if lowercase:
+        text = text.lower()
+    tokens = token_pattern.findall(text)
+    low, high = ngram_range
+    grams = list(tokens) if low == 1 else []
+    for n in range(max(low, 2), high + 1):
+        grams.extend(' '.join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+    return grams
+
+
+def _normalize(X, norm):
+    from scipy import sparse
+
+    if norm == 'l2':
+        norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+    elif norm == 'l1':
+        norms = np.asarray(abs(X).sum(axis=1)).ravel()
+    else:
+        return X.tocsr()
+    norms[norms == 0] = 1
+    return (sparse.diags(1 / norms) @ X).tocsr()
+
+
+def murmurhash3_32(data, seed=0):
+    """Signed 32-bit MurmurHash3 (x86) of `data` bytes, the hash HashingVectorizer uses"""
+    def mix(k):
+        k = (k * 0xCC9E2D51) & _MASK32
+        k = ((k << 15) | (k >> 17)) & _MASK32
+        return (k * 0x1B873593) & _MASK32
+
+    h = seed & _MASK32
+    end = len(data) - len(data) % 4
+    for i in range(0, end, 4):
+        h ^= mix(int.from_bytes(data[i:i + 4], 'little'))
+        h = ((h << 13) | (h >> 19)) & _MASK32
+        h = (h * 5 + 0xE6546B64) & _MASK32
+    if end < len(data):
+        h ^= mix(int.from_bytes(data[end:], 'little'))
+    h ^= len(data)
+    h ^= h >> 16
+    h = (h * 0x85EBCA6B) & _MASK32
+    h ^= h >> 13
+    h = (h * 0xC2B2AE35) & _MASK32
+    h ^= h >> 16
+    return h - (1 << 32) if h & 0x80000000 else h
+
+
+class MappedTfidfVectorizer:
+    """Tf-idf `transform` over a saved vocabulary and idf, memory-mapped at load.
+
+    The vocabulary is stored sorted, so terms are found by binary search
+    in the mapped array instead of a dict built at load time. Output
+    matches the TfidfVectorizer it was saved from.
+    """
+
+    def __init__(self, directory, params):
+        self.directory = directory
+        self.ngram_range = tuple(params['ngram_range'])
+        self.lowercase = params['lowercase']
+        self.token_pattern = re.compile(params['token_pattern'])
+        self.norm = params['norm']
+        self.sublinear_tf = params['sublinear_tf']
+        self.binary = params.get('binary', False)
+        # Mapping reads only the .npy headers; pages are read on use
+        self.arrays = tuple(np.load(os.path.join(directory, name), mmap_mode='r')
+                            for name in ('vocabulary.npy', 'columns.npy', 'idf.npy'))
+
+    @property
+    def idf_(self):
+        return self.arrays[2]
+
+    def get_feature_names_out(self):
+        vocabulary, columns, _ = self.arrays
+        terms = np.empty(len(vocabulary), dtype=object)
+        terms[columns] = vocabulary
+        return terms
+
+    def transform(self, texts):
+        from scipy import sparse
+
+        vocabulary, columns, idf = self.arrays
+        indptr, indices, data = [0], [], []
+        for text in texts:
+            grams = _analyze(text, self.lowercase, self.token_pattern, self.ngram_range)
+            if grams and len(vocabulary):
+                grams = np.array(grams)
+                positions = np.minimum(np.searchsorted(vocabulary, grams), len(vocabulary) - 1)
+                found = positions[vocabulary[positions] == grams]
+                features, counts = np.unique(columns[found], return_counts=True)
+                indices.extend(features)
+                data.extend(counts)
+            indptr.append(len(indices))
+        X = sparse.csr_matrix((np.asarray(data, dtype=float), np.asarray(indices, dtype=np.int64), indptr),
+                              shape=(len(texts), len(vocabulary)))
+        if self.binary:
+            X.data.fill(1)
+        if self.sublinear_tf:
+            X.data = np.log(X.data) + 1
+        X = (X @ sparse.diags(np.asarray(idf))).tocsr()
+        return _normalize(X, self.norm)
+
+
+class SavedHashingVectorizer:
+    """`transform` of a saved HashingVectorizer, without importing scikit-learn.
+
+    Terms are hashed with the same MurmurHash3 and folded into `n_features`
+    columns the same way, so the output matches the original vectorizer.
+    """
+
+    def __init__(self, params):
+        self.n_features = params['n_features']
+        self.ngram_range = tuple(params['ngram_range'])
+        self.lowercase = params['lowercase']
+        self.token_pattern = re.compile(params['token_pattern'])
+        self.alternate_sign = params['alternate_sign']
+        self.binary = params['binary']
+        self.norm = params['norm']
+
+    def _column(self, term):
+        h = murmurhash3_32(term.encode('utf-8'))
+        # abs(-2**31) overflows int32; scikit-learn folds it like this
+        column = (2 ** 31 - 1 - (self.n_features - 1)) % self.n_features if h == -2 ** 31 \
+            else abs(h) % self.n_features
+        return column, -1.0 if self.alternate_sign and h < 0 else 1.0
+
+    def transform(self, texts):
+        from scipy import sparse
+
+        indptr, indices, data = [0], [], []
+        for text in texts:
+            for term in _analyze(text, self.lowercase, self.token_pattern, self.ngram_range):
+                column, sign = self._column(term)
+                indices.append(column)
+                data.append(sign)
+            indptr.append(len(indices))
+        X = sparse.csr_matrix((np.asarray(data, dtype=float), np.asarray(indices, dtype=np.int64), indptr),
+                              shape=(len(texts), self.n_features))
+        X.sum_duplicates()
+        if self.binary:
+            X.data.fill(1)
+        return _normalize(X, self.norm)
+
+
+class MappedCentroids:
+    """Nearest-centroid `predict` over saved k-means centers, memory-mapped at load"""
+
+    def __init__(self, path):
+        self.path = path
+        self.cluster_centers_ = np.load(path, mmap_mode='r')
+
+    @property
+    def n_clusters(self):
+        return len(self.cluster_centers_)
+
+    def predict(self, X):
+        centers = self.cluster_centers_
+        # |x - c|^2 without the |x|^2 term, which is the same for every center
+        distances = (centers ** 2).sum(axis=1) - 2 * np.asarray(X @ centers.T)
+        return np.argmin(distances, axis=1)
+
+
+def _vectorizer_entry(vectorizer, directory):
+    """Write a vectorizer's arrays to `directory`; returns its manifest entry"""
+    if isinstance(vectorizer, MappedTfidfVectorizer):
+        # From the mapped arrays: their version may have been pruned since
+        for name, array in zip(('vocabulary.npy', 'columns.npy', 'idf.npy'), vectorizer.arrays):
+            np.save(os.path.join(directory, name), array)
+        return {'kind': 'tfidf', 'params': {
+            'ngram_range': list(vectorizer.ngram_range), 'lowercase': vectorizer.lowercase,
+            'token_pattern': vectorizer.token_pattern.pattern, 'norm': vectorizer.norm,
+            'sublinear_tf': vectorizer.sublinear_tf, 'binary': vectorizer.binary,
+        }}
+    if isinstance(vectorizer, SavedHashingVectorizer):
+        return {'kind': 'hashing', 'params': {
+            'n_features': vectorizer.n_features, 'ngram_range': list(vectorizer.ngram_range),
+            'alternate_sign': vectorizer.alternate_sign, 'norm': vectorizer.norm,
+            'lowercase': vectorizer.lowercase, 'token_pattern': vectorizer.token_pattern.pattern,
+            'binary': vectorizer.binary,
+        }}
+    params = vectorizer.get_params()
+    if params['analyzer'] != 'word' or params['stop_words'] is not None or params['preprocessor'] \
+            or params['tokenizer'] or params['strip_accents']:
+        raise ValueError("Only plain word vectorizers can be saved")
+    if 'use_idf' in params:
+        if not hasattr(vectorizer, 'vocabulary_'):
+            raise ValueError("The tf-idf vectorizer must be fitted before saving")
+        terms = np.array(sorted(vectorizer.vocabulary_))
+        columns = np.array([vectorizer.vocabulary_[term] for term in terms], dtype=np.int64)
+        # Without idf weighting every column keeps its term frequency
+        idf = np.asarray(vectorizer.idf_, dtype=float) if params['use_idf'] else np.ones(len(terms))
+        np.save(os.path.join(directory, 'vocabulary.npy'), terms)
+        np.save(os.path.join(directory, 'columns.npy'), columns)
+        np.save(os.path.join(directory, 'idf.npy'), idf)
+        return {'kind': 'tfidf', 'params': {
+            'ngram_range': list(params['ngram_range']), 'lowercase': params['lowercase'],
+            'token_pattern': params['token_pattern'], 'norm': params['norm'],
+            'sublinear_tf': params['sublinear_tf'], 'binary': params['binary'],
+        }}
+    if 'n_features' in params and 'alternate_sign' in params:
+        # A hashing vectorizer is stateless; its parameters are all there is
+        return {'kind': 'hashing', 'params': {
+            name: list(value) if isinstance(value, tuple) else value
+            for name, value in params.items()
+            if name in ('n_features', 'ngram_range', 'alternate_sign', 'norm',
+                        'lowercase', 'token_pattern', 'binary')
+        }}
+    raise ValueError(f"Cannot save a {type(vectorizer).__name__}; only tf-idf and hashing vectorizers are supported")
+
+
+def _load_vectorizer(entry, directory):
+    if entry['kind'] == 'tfidf':
+        return MappedTfidfVectorizer(directory, entry['params'])
+    return SavedHashingVectorizer(entry['params'])
+
+
+def current_version(directory):
+    """The version CURRENT points at, or None if nothing was saved yet"""
+    try:
+        with open(os.path.join(directory, 'CURRENT'), encoding='utf-8') as f:
+            match = _VERSION_DIR.match(f.read().strip())
+    except FileNotFoundError:
+        return None
+    return int(match.group(1)) if match else None
+
+
+def save(directory, resources, keep=KEEP_VERSIONS):
+    """Write `resources` as a new artifact version; returns the version number.
+
+    The arrays and manifest go to a temporary directory, which is renamed
+    to v<version> and then published by atomically replacing CURRENT, so
+    a crash at any point leaves the previous version intact.
+    """
+    os.makedirs(directory, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.tmp-', dir=directory)
+    try:
+        manifest = {
+            'format': FORMAT,
+            'schema': SCHEMA_VERSION,
+            'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'vectorizer': None,
+            'kmeans': None,
+            'common_queries': list(resources.get('common_queries') or []),
+        }
+        if resources.get('vectorizer') is not None:
+            manifest['vectorizer'] = _vectorizer_entry(resources['vectorizer'], staging)
+        if resources.get('kmeans') is not None:
+            np.save(os.path.join(staging, 'centroids.npy'),
+                    np.asarray(resources['kmeans'].cluster_centers_, dtype=float))
+            manifest['kmeans'] = {'centroids': 'centroids.npy'}
+        # Destinations map to positions in common_queries
+        positions = {query: i for i, query in enumerate(manifest['common_queries'])}
+        manifest['suggestions'] = {
+            destination: [positions[query] for query in queries]
+            for destination, queries in (resources.get('suggestions') or {}).items()
+        }
+        for name in os.listdir(staging):
+            with open(os.path.join(staging, name), 'rb') as f:
+                os.fsync(f.fileno())
+        version = max([current_version(directory) or 0] + _versions(directory)) + 1
+        while True:
+            manifest['version'] = version
+            with open(os.path.join(staging, 'manifest.json'), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f)
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                os.rename(staging, os.path.join(directory, f"v{version:06d}"))
+                break
+            except OSError as e:
+                # Another process took this version number; anything else
+                # (permissions, a full disk) would fail for every number
+                if e.errno not in (errno.EEXIST, errno.ENOTEMPTY):
+                    raise
+                version += 1
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    pointer = os.path.join(directory, f"CURRENT.tmp-{os.getpid()}")
+    with open(pointer, 'w', encoding='utf-8') as f:
+        f.write(f"v{version:06d}\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer, os.path.join(directory, 'CURRENT'))
+    for old in _versions(directory)[:-keep]:
+        if old != version:
+            shutil.rmtree(os.path.join(directory, f"v{old:06d}"), ignore_errors=True)
+    return version
+
+
+def _versions(directory):
+    versions = []
+    for name in os.listdir(directory):
+        match = _VERSION_DIR.match(name)
+        if match:
+            versions.append(int(match.group(1)))
+    return sorted(versions)
+
+
+def load(directory):
+    """Resources of the current version, with its arrays memory-mapped; None if there is none"""
+    while True:
+        version = current_version(directory)
+        if version is None:
+            return None
+        try:
+            return _load_version(directory, version)
+        except FileNotFoundError:
+            # Pruned by newer saves after we read CURRENT; retry with the new one
+            if current_version(directory) == version:
+                raise
+
+
+def _load_version(directory, version):
+    path = os.path.join(directory, f"v{version:06d}")
+    with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != FORMAT or manifest.get('schema') != SCHEMA_VERSION:
+        raise ValueError(f"Unsupported model artifact {manifest.get('format')} schema {manifest.get('schema')}")
+    common_queries = manifest['common_queries']
+    resources = {
+        'vectorizer': _load_vectorizer(manifest['vectorizer'], path) if manifest['vectorizer'] else None,
+        'kmeans': MappedCentroids(os.path.join(path, manifest['kmeans']['centroids'])) if manifest['kmeans'] else None,
+        'common_queries': common_queries,
+        'suggestions': {destination: [common_queries[i] for i in positions]
+                        for destination, positions in manifest['suggestions'].items()},
+    }
+    logger.info("Loaded chatbot model version %d from %s", version, directory)
+    return resources
@@ -0,0 +1,197 @@
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+
+# Pages younger than this are served without contacting the site at all;
+# older ones are revalidated with a conditional GET
+PAGE_FRESH_SECONDS = int(os.getenv("PAGE_CACHE_FRESH_SECONDS", str(6 * 60 * 60)))
+# Search result URL lists for a query are reused for this long
+QUERY_TTL_SECONDS = int(os.getenv("PAGE_CACHE_QUERY_TTL", str(24 * 60 * 60)))
+MAX_PAGES = int(os.getenv("PAGE_CACHE_MAX_PAGES", "5000"))
+MAX_QUERIES = int(os.getenv("PAGE_CACHE_MAX_QUERIES", "5000"))
+# Last-use times from cache hits are written in batches of this many
+TOUCH_BATCH = 64
+
+
+def normalize_query(query, num_results=None):
+    key = ' '.join(query.casefold().split())
+    return key if num_results is None else f"{num_results}:{key}"
+
+
+class PageCache:
+    """SQLite store of extracted page snippets and search result URL lists.
+
+    Each page keeps its ETag / Last-Modified validators so a stale entry can
+    be revalidated with a conditional request; a 304 answer reuses the
+    stored title and snippet without downloading or parsing the page. Both
+    tables are bounded and evict the least recently used rows; the last-use
+    times of hits are kept in memory and written with the next write. The
+    database is opened on first use.
+    """
+
+    def __init__(self, db_path, max_pages=MAX_PAGES, max_queries=MAX_QUERIES,
+                 fresh_seconds=PAGE_FRESH_SECONDS, query_ttl=QUERY_TTL_SECONDS):
+        self.max_pages = max_pages
+        self.max_queries = max_queries
+        self.fresh_seconds = fresh_seconds
+        self.query_ttl = query_ttl
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.counts = {'fresh_hits': 0, 'stale_hits': 0, 'revalidated': 0,
+                       'misses': 0, 'query_hits': 0, 'query_misses': 0}
+        self._touched = {'pages': {}, 'queries': {}}
+        self._db = None
+
+    def _connect(self):
+        """The database connection, opened on first use; call with the lock held"""
+        if self._db is not None:
+            return self._db
+        db = sqlite3.connect(self.db_path, check_same_thread=False)
+        db.executescript(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY, title TEXT, snippet TEXT, etag TEXT,"
+            " last_modified TEXT, checked REAL, used REAL);"
+            "CREATE INDEX IF NOT EXISTS pages_used ON pages (used);"
+            "CREATE TABLE IF NOT EXISTS queries ("
+            " query TEXT PRIMARY KEY, urls TEXT, stored REAL, used REAL);"
+            "CREATE INDEX IF NOT EXISTS queries_used ON queries (used);"
+        )
+        db.commit()
+        self._db = db
+        return db
+
+    def _touch(self, table, key, now):
+        self._touched[table][key] = now
+        if sum(map(len, self._touched.values())) >= TOUCH_BATCH:
+            self._write_touched()
+            self._db.commit()
+
+    def _write_touched(self):
+        for table, touched in self._touched.items():
+            if touched:
+                key = 'url' if table == 'pages' else 'query'
+                self._db.executemany(f"UPDATE {table} SET used = ? WHERE {key} = ?",
+                                     [(used, k) for k, used in touched.items()])
+                touched.clear()
+
+    def get_page(self, url):
+        """Return the cached page as a dict (with a 'fresh' flag), or None"""
+        now = time.time()
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT title, snippet, etag, last_modified, checked FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                self.counts['misses'] += 1
+                return None
+            self._touch('pages', url, now)
+            title, snippet, etag, last_modified, checked = row
+            fresh = now - checked < self.fresh_seconds
+            self.counts['fresh_hits' if fresh else 'stale_hits'] += 1
+        return {
+            'title': title,
+            'link': url,
+            'snippet': snippet,
+            'etag': etag,
+            'last_modified': last_modified,
+            'fresh': fresh,
+        }
+
+    def conditional_headers(self, page):
+        """Request headers that let the site answer 304 Not Modified"""
+        headers = {}
+        if page.get('etag'):
+            headers['If-None-Match'] = page['etag']
+        if page.get('last_modified'):
+            headers['If-Modified-Since'] = page['last_modified']
+        return headers
+
+    def put_page(self, url, title, snippet, etag=None, last_modified=None):
+        now = time.time()
+        with self._lock:
+            self._connect()
+            self._write_touched()
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages (url, title, snippet, etag, last_modified, checked, used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, title, snippet, etag, last_modified, now, now),
+            )
+            self._evict('pages', self.max_pages)
+            self._db.commit()
+
+    def mark_revalidated(self, url):
+        """Record a 304 answer: the stored copy is fresh again"""
+        now = time.time()
+        with self._lock:
+            self.counts['revalidated'] += 1
+            self._connect()
+            self._touched['pages'].pop(url, None)
+            self._db.execute("UPDATE pages SET checked = ?, used = ? WHERE url = ?", (now, now, url))
+            self._db.commit()
+
+    def get_urls(self, query, num_results=None):
+        """Cached result URLs for a query and result count, or None if absent or expired"""
+        key = normalize_query(query, num_results)
+        now = time.time()
+        with self._lock:
+            row = self._connect().execute("SELECT urls, stored FROM queries WHERE query = ?", (key,)).fetchone()
+            if row is None or now - row[1] >= self.query_ttl:
+                self.counts['query_misses'] += 1
+                return None
+            self.counts['query_hits'] += 1
+            self._touch('queries', key, now)
+        return row[0].split('\n') if row[0] else []
+
+    def put_urls(self, query, urls, num_results=None):
+        now = time.time()
+        with self._lock:
+            self._connect()
+            self._write_touched()
+            self._db.execute(
+                "INSERT OR REPLACE INTO queries (query, urls, stored, used) VALUES (?, ?, ?, ?)",
+                (normalize_query(query, num_results), '\n'.join(urls), now, now),
+            )
+            self._evict('queries', self.max_queries)
+            self._db.commit()
+
+    def _evict(self, table, limit):
+        (count,) = self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+        if count > limit:
+            key = 'url' if table == 'pages' else 'query'
+            self._db.execute(
+                f"DELETE FROM {table} WHERE {key} IN "
+                f"(SELECT {key} FROM {table} ORDER BY used LIMIT ?)",
+                (count - limit,),
+            )
+
+    def stats(self):
+        with self._lock:
+            (pages,) = self._connect().execute("SELECT COUNT(*) FROM pages").fetchone()
+            (queries,) = self._db.execute("SELECT COUNT(*) FROM queries").fetchone()
+        return {'pages': pages, 'queries': queries, **self.counts}
+
+
+# Shared by every session; set PAGE_CACHE_DB to move the file. Nothing is
+# opened until the first lookup.
+default_page_cache = PageCache(os.getenv("PAGE_CACHE_DB", "page_cache.sqlite"))
+
+
+def _metric_samples():
+    stats = default_page_cache.stats()
+    page_lookups = stats['fresh_hits'] + stats['stale_hits'] + stats['misses']
+    query_lookups = stats['query_hits'] + stats['query_misses']
+    samples = [('page_cache_rows', {'table': 'pages'}, stats['pages']),
+               ('page_cache_rows', {'table': 'queries'}, stats['queries']),
+               ('page_cache_hit_ratio', {'table': 'pages'},
+                (stats['fresh_hits'] + stats['revalidated']) / page_lookups if page_lookups else 0.0),
+               ('page_cache_hit_ratio', {'table': 'queries'},
+                stats['query_hits'] / query_lookups if query_lookups else 0.0)]
+    for outcome in ('fresh_hits', 'stale_hits', 'revalidated', 'misses', 'query_hits', 'query_misses'):
+        samples.append(('page_cache_lookups', {'outcome': outcome}, stats[outcome]))
+    return samples
+
+
+metrics.register_collector('page_cache', _metric_samples)
@@ -1,183 +1,252 @@
+import copy
 import pandas as pd
 import numpy as np
 import pickle
 import os
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.neighbors import NearestNeighbors
-from sklearn.cluster import KMeans
+import queue
+import threading
+import model_artifact
+from history_store import SearchHistoryStore
+from similarity_index import SimilarityIndex
+
+# Keep the shared chatbot's model current in the background as queries arrive
+ONLINE_TRAINING = os.getenv("CHATBOT_ONLINE_TRAINING", "1") not in ("", "0")
+# Online updates between reassigning every query to its nearest centroid
+# (at least a tenth of the corpus, so relabelling stays amortized O(1))
+RELABEL_EVERY = 200
+# Online updates between saving the model to disk
+SAVE_EVERY = 50
+# Cosine similarity a common query needs to a destination's queries to be
+# suggested for that destination
+SUGGESTION_THRESHOLD = 0.3
 
 class PredictiveChatbot:
-    def __init__(self, model_path='chatbot_model.pkl', data_path='search_history.csv'):
+    def __init__(self, model_path='chatbot_model.pkl', data_path='search_history.csv', db_path=None,
+                 online=False, model_dir=None):
+        # The pickle is only read, to seed a model_dir that has no versions yet
         self.model_path = model_path
+        self.model_dir = model_dir or os.path.splitext(model_path)[0]
         self.data_path = data_path
-        self.model = None
-        self.vectorizer = None
-        self.kmeans = None
-        self.common_queries = None
+        # Live history store; the CSV is kept as an import/export format
+        self.db_path = db_path or os.path.splitext(data_path)[0] + '.sqlite'
+        # Vectorizer, kmeans, common queries and the per-destination
+        # suggestion table. Training publishes a new dict instead of mutating
+        # this one, so a reader that takes it once sees a consistent model.
+        self._resources = {}
+        # Held while building a new resources dict from the current one and
+        # publishing it, so concurrent updates don't undo each other
+        self._publish_lock = threading.Lock()
+        self.trainer = OnlineTrainer(self) if online else None
+        # Similar-query index over the history. It imports sklearn, so it is
+        # built in the background once the first query comes in, after the
+        # first render, and no request waits for it
+        self._similar = None
+        self._similar_lock = threading.Lock()
+        self._similar_thread = None
+        self._similar_start_lock = threading.Lock()
+        # The model waits until first use; a pickled one imports sklearn
+        self._model_loaded = False
+        self._model_lock = threading.Lock()
         
-        # Try to load existing model and data
+        # Try to load existing data
         self._load_resources()
     
+    def _load_model(self):
+        """Load the saved model on first use"""
+        if self._model_loaded:
+            return
+        with self._model_lock:
+            if self._model_loaded:
+                return
+            try:
+                # Arrays are memory-mapped, so processes share their pages
+                resources = model_artifact.load(self.model_dir)
+                if resources is not None:
+                    self._resources = resources
+                elif os.path.exists(self.model_path):
+                    with open(self.model_path, 'rb') as f:
+                        resources = pickle.load(f)
+                    # Models saved before the suggestion table existed
+                    if resources.get('common_queries') and 'suggestions' not in resources:
+                        history = self.search_history
+                        resources['suggestions'] = update_suggestion_table(
+                            {}, resources['vectorizer'], resources['common_queries'],
+                            history['query'].tolist(), history['destination'].tolist())
+                    self._resources = resources
+                    print(f"Loaded existing model and resources from {self.model_path}")
+            except Exception as e:
+                print(f"Error loading model: {str(e)}")
+            self._model_loaded = True
+    
     def _load_resources(self):
-        """Load the model and search history if they exist"""
+        """Open the search history store; the model is loaded lazily"""
         try:
-            # Try to load model
-            if os.path.exists(self.model_path):
-                with open(self.model_path, 'rb') as f:
-                    resources = pickle.load(f)
-                    self.model = resources.get('model')
-                    self.vectorizer = resources.get('vectorizer')
-                    self.kmeans = resources.get('kmeans')
-                    self.common_queries = resources.get('common_queries')
-                print(f"Loaded existing model and resources from {self.model_path}")
-            
-            # Try to load search history
-            if os.path.exists(self.data_path):
-                self.search_history = pd.read_csv(self.data_path)
-                print(f"Loaded {len(self.search_history)} previous searches from {self.data_path}")
-            else:
-                # Initialize empty search history
-                self.search_history = pd.DataFrame(columns=['query', 'destination', 'count'])
+            self.history = SearchHistoryStore(self.db_path)
+            # First run on this store: import the CSV history
+            if len(self.history) == 0 and os.path.exists(self.data_path):
+                count = self.history.import_csv(self.data_path)
+                print(f"Imported {count} previous searches from {self.data_path}")
+            elif len(self.history) == 0:
                 print("No existing search history found. Starting with empty history.")
+            else:
+                print(f"Loaded {len(self.history)} previous searches from {self.db_path}")
         except Exception as e:
             print(f"Error loading resources: {str(e)}")
-            # Initialize empty search history
-            self.search_history = pd.DataFrame(columns=['query', 'destination', 'count'])
+            # Keep working without persistence
+            self.history = SearchHistoryStore(':memory:')
+    
+    @property
+    def vectorizer(self):
+        return self._resources.get('vectorizer')
+    
+    @property
+    def kmeans(self):
+        return self._resources.get('kmeans')
+    
+    @property
+    def common_queries(self):
+        return self._resources.get('common_queries')
+    
+    @property
+    def search_history(self):
+        """The history as a query/destination/count DataFrame"""
+        return self.history.frame()
     
     def save_resources(self):
-        """Save the model and search history"""
-        # Save model and related resources
-        with open(self.model_path, 'wb') as f:
-            resources = {
-                'model': self.model,
-                'vectorizer': self.vectorizer,
-                'kmeans': self.kmeans,
-                'common_queries': self.common_queries
-            }
-            pickle.dump(resources, f)
+        """Save the model and export the search history"""
+        # Never overwrite the saved model with one that was not loaded yet
+        self._load_model()
+        # A new artifact version; readers keep the old one until it is complete
+        if self._resources.get('vectorizer') is not None:
+            model_artifact.save(self.model_dir, self._resources)
         
         # Save search history
-        self.search_history.to_csv(self.data_path, index=False)
-        print(f"Saved model and search history ({len(self.search_history)} queries)")
+        self.history.flush()
+        self.history.export_csv(self.data_path)
+        print(f"Saved model and search history ({len(self.history)} queries)")
     
     def record_query(self, query, destination=None):
-        # Check if this query already exists for this destination
-        existing = self.search_history[
-            (self.search_history['query'] == query) & 
-            (self.search_history['destination'] == destination)
-        ]
-        
-        if len(existing) > 0:
-            # Update count of existing query
-            idx = existing.index[0]
-            self.search_history.at[idx, 'count'] += 1
+        # O(1) count update; the store writes changes to disk in batches
+        self.history.increment(query, destination)
+        # The model update happens on the trainer's thread
+        if self.trainer is not None:
+            self.trainer.submit(query, destination)
+            return
+        if self._similar is not None:
+            self._similar.add(query, destination)
         else:
-            # Add new query
-            new_row = pd.DataFrame({
-                'query': [query],
-                'destination': [destination],
-                'count': [1]
-            })
-            self.search_history = pd.concat([self.search_history, new_row], ignore_index=True)
-        
-        # Save after each update
-        self.save_resources()
+            self._start_similarity_index()
+        # Without one, only the suggestion table learns about the query; a
+        # copy is updated so readers of the published one never see it change.
+        # The saved table is loaded first so the query is not lost from it.
+        if destination:
+            self._load_model()
+        if destination and self._resources.get('suggestions') is not None:
+            with self._publish_lock:
+                resources = self._resources
+                suggestions = update_suggestion_table(dict(resources['suggestions']), resources['vectorizer'],
+                                                      resources['common_queries'], [query], [destination])
+                self._resources = dict(resources, suggestions=suggestions)
     
     def train_model(self, min_samples=10):
+        self._load_model()
         # Check if we have enough data to train
         if len(self.search_history) < min_samples:
             print(f"Not enough data to train model yet. Have {len(self.search_history)}, need {min_samples}")
             return False
         
         try:
-            # Prepare the data - use queries weighted by count
-            queries = []
-            for _, row in self.search_history.iterrows():
-                # Add each query multiple times based on its count (frequency weighting)
-                for _ in range(int(row['count'])):
-                    queries.append(row['query'])
+            from sklearn.cluster import KMeans
+            
+            # One row per distinct query; its total count is its weight
+            weighted = self.search_history.groupby('query', sort=False)['count'].sum()
+            unique_queries = weighted.index.tolist()
+            weights = weighted.to_numpy(dtype=float)
             
             # Vectorize the queries
-            self.vectorizer = TfidfVectorizer(
+            vectorizer, X = fit_weighted_tfidf(
+                unique_queries, weights,
                 min_df=2,
                 max_df=0.7,
                 ngram_range=(1, 2)
             )
-            X = self.vectorizer.fit_transform(queries)
             
-            # Train a nearest neighbors model
-            self.model = NearestNeighbors(
-                n_neighbors=5,
-                algorithm='ball_tree'
-            )
-            self.model.fit(X)
+            # Similar queries come from similarity_index(), not a model fit here
+            resources = {key: value for key, value in self._resources.items() if key != 'model'}
+            resources['vectorizer'] = vectorizer
             
             # Also train a K-means for clustering common questions
-            n_clusters = min(5, len(self.search_history) // 2)
+            n_clusters = min(5, len(self.search_history) // 2, len(unique_queries))
             if n_clusters > 1:
-                self.kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-                self.kmeans.fit(X)
-                
-                # Find the most common query in each cluster
-                cluster_labels = self.kmeans.predict(X)
-                unique_queries = list(set(queries))
-                vectorized = self.vectorizer.transform(unique_queries)
-                
-                # For each cluster, find the query closest to the centroid
-                self.common_queries = []
-                for i in range(n_clusters):
-                    # Get queries in this cluster
-                    cluster_queries = [q for j, q in enumerate(unique_queries) 
-                                    if self.kmeans.predict(self.vectorizer.transform([q]))[0] == i]
-                    
-                    if cluster_queries:
-                        # Find most frequent in this cluster
-                        query_counts = {q: queries.count(q) for q in cluster_queries}
-                        most_common = max(query_counts.items(), key=lambda x: x[1])[0]
-                        self.common_queries.append(most_common)
+                kmeans = KMeans(n_clusters=n_clusters, random_state=42)
+                kmeans.fit(X, sample_weight=weights)
+                resources['kmeans'] = kmeans
+                resources['common_queries'] = cluster_representatives(
+                    unique_queries, weights, kmeans.predict(X))
+                history = self.search_history
+                resources['suggestions'] = update_suggestion_table(
+                    {}, vectorizer, resources['common_queries'],
+                    history['query'].tolist(), history['destination'].tolist())
+            with self._publish_lock:
+                self._resources = resources
             
             # Save the trained model
             self.save_resources()
-            print(f"Model trained successfully with {len(queries)} weighted queries")
+            print(f"Model trained successfully with {int(weights.sum())} weighted queries")
             return True
             
         except Exception as e:
             print(f"Error training model: {str(e)}")
             return False
     
+    def _start_similarity_index(self):
+        """Start building the similar-query index on a background thread, once"""
+        if self._similar_thread is None:
+            with self._similar_start_lock:
+                if self._similar_thread is None:
+                    self._similar_thread = threading.Thread(target=self.similarity_index, daemon=True,
+                                                            name="similar-index")
+                    self._similar_thread.start()
+    
+    def similarity_index(self):
+        """The similar-query index; builds it from the history or waits for the build"""
+        if self._similar is None:
+            with self._similar_lock:
+                if self._similar is None:
+                    history = self.search_history
+                    self._similar = SimilarityIndex().build(history['query'].tolist(),
+                                                            history['destination'].tolist())
+        return self._similar
+    
+    def similar_queries(self, text, destination=None, k=5, min_score=SUGGESTION_THRESHOLD):
+        """Up to `k` (similarity, query) pairs of past queries most like `text`.
+        
+        `destination` limits them to queries asked about that destination.
+        The text itself is left out. Empty until the index has been built.
+        """
+        index = self._similar
+        if index is None:
+            self._start_similarity_index()
+            return []
+        asked = text.strip().casefold()
+        hits = index.search(text, destination, k + 1, min_score)
+        return [(score, query) for score, query in hits if query.strip().casefold() != asked][:k]
+    
     def get_suggested_queries(self, destination=None, top_n=3):
+        self._load_model()
+        # One read, so a model swapped in meanwhile cannot mix with this one
+        resources = self._resources
+        common_queries = resources.get('common_queries')
         # If we have common queries from clustering, use those
-        if self.common_queries:
+        if common_queries:
             if destination:
-                # Filter common queries that are relevant to this destination
-                dest_queries = self.search_history[
-                    self.search_history['destination'] == destination
-                ]['query'].tolist()
-                
-                # If we have destination-specific queries, use those
-                if dest_queries:
-                    # Vector representation of destination queries
-                    dest_vectors = self.vectorizer.transform(dest_queries)
-                    common_vectors = self.vectorizer.transform(self.common_queries)
-                    
-                    # Find the nearest common queries to the destination queries
-                    suggestions = []
-                    for i, query in enumerate(self.common_queries):
-                        # Check if this common query is similar to any destination query
-                        for j, dest_query in enumerate(dest_queries):
-                            if cosine_similarity(
-                                common_vectors[i], 
-                                dest_vectors[j]
-                            )[0][0] > 0.3:
-                                suggestions.append(query)
-                                break
-                    
-                    # If we found suggestions, return them
-                    if suggestions:
-                        return suggestions[:top_n]
+                # Common queries similar to this destination's queries
+                suggestions = resources.get('suggestions', {}).get(destination)
+                if suggestions:
+                    return suggestions[:top_n]
             
             # If no destination-specific suggestions, return top common queries
-            return self.common_queries[:top_n]
+            return common_queries[:top_n]
         
         # If no clustering model, return the most frequent queries
         if len(self.search_history) > 0:
@@ -199,7 +268,226 @@ class PredictiveChatbot:
             "What should I pack for my trip?"
         ]
 
-# Helper function for cosine similarity
-def cosine_similarity(a, b):
-    """Calculate cosine similarity between two sparse vectors"""
-    return (a * b.T).toarray()
\ No newline at end of file
+def fit_weighted_tfidf(texts, weights, min_df=2, max_df=0.7, ngram_range=(1, 2)):
+    """Fit a TfidfVectorizer as if each text appeared `weight` times.
+
+    Document frequencies are summed weights, so `min_df`/`max_df` and the
+    idf match fitting on the expanded list, without building it. Returns
+    the fitted vectorizer and the tf-idf matrix of `texts`.
+    """
+    from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+    from sklearn.preprocessing import normalize
+    
+    counts = CountVectorizer(ngram_range=ngram_range).fit(texts)
+    C = counts.transform(texts).tocsc()
+    n_docs = weights.sum()
+    # Weighted document frequency of every term
+    presence = C.copy()
+    presence.data[:] = 1
+    df = presence.T @ weights
+    max_count = max_df * n_docs if isinstance(max_df, float) else max_df
+    min_count = min_df * n_docs if isinstance(min_df, float) else min_df
+    keep = np.flatnonzero((df >= min_count) & (df <= max_count))
+    if len(keep) == 0:
+        raise ValueError("After pruning, no terms remain. Try a lower min_df or a higher max_df.")
+    
+    terms = counts.get_feature_names_out()[keep]
+    # Same vocabulary order and smoothed idf that TfidfVectorizer.fit uses
+    order = np.argsort(terms)
+    terms, keep = terms[order], keep[order]
+    idf = np.log((1 + n_docs) / (1 + df[keep])) + 1
+    vectorizer = TfidfVectorizer(ngram_range=ngram_range, vocabulary={t: i for i, t in enumerate(terms)})
+    vectorizer.idf_ = idf
+    X = normalize(C[:, keep].multiply(idf).tocsr())
+    return vectorizer, X
+
+class OnlineTrainer:
+    """Keeps a chatbot's suggestion model current from a background thread.
+    
+    Queries are hashed with a HashingVectorizer, which needs no fitted
+    vocabulary, and fed to MiniBatchKMeans.partial_fit as they arrive, so a
+    new query costs one small update instead of a full retrain. Each update
+    works on copies of the published clusters and suggestion table and
+    publishes them in a new resources dict with a single assignment, so a
+    reader never sees a half-updated model.
+    The thread starts with the first submitted query.
+    """
+    
+    def __init__(self, chatbot, min_samples=10, n_features=2 ** 18, batch_size=1024,
+                 relabel_every=RELABEL_EVERY, save_every=SAVE_EVERY):
+        self.chatbot = chatbot
+        self.min_samples = min_samples
+        self.n_features = n_features
+        self.batch_size = batch_size
+        self.relabel_every = relabel_every
+        self.save_every = save_every
+        self.queue = queue.Queue()
+        self.vectorizer = None
+        self.kmeans = None
+        self.weights = {}
+        self.labels = {}
+        # cluster -> (weight, query) of its most frequent query
+        self.best = {}
+        self._since_relabel = 0
+        self._since_save = 0
+        self._thread = None
+        self._start_lock = threading.Lock()
+    
+    def submit(self, query, destination=None):
+        """Queue a newly recorded query; returns immediately"""
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, daemon=True, name="chatbot-trainer")
+                    self._thread.start()
+        self.queue.put((query, destination))
+    
+    def join(self):
+        """Wait until every submitted query has been trained on"""
+        self.queue.join()
+    
+    def _run(self):
+        from sklearn.feature_extraction.text import HashingVectorizer
+        
+        # A lazy load later must not replace the online model with the saved one
+        self.chatbot._load_model()
+        self.chatbot.similarity_index()
+        self.vectorizer = HashingVectorizer(ngram_range=(1, 2), n_features=self.n_features,
+                                            alternate_sign=False)
+        while True:
+            batch = [self.queue.get()]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                if self.kmeans is None:
+                    # The history already counts the queued queries
+                    self._bootstrap()
+                else:
+                    self._update(batch)
+                self._since_save += len(batch)
+                if self.kmeans is not None and self._since_save >= self.save_every:
+                    self._since_save = 0
+                    self.chatbot.save_resources()
+                # The history already counts these, so the index may have them too
+                for query, destination in batch:
+                    self.chatbot._similar.add(query, destination)
+            except Exception as e:
+                print(f"Error updating model: {str(e)}")
+            for _ in batch:
+                self.queue.task_done()
+    
+    def _bootstrap(self):
+        """Fit the clusters on the whole history once there is enough of it"""
+        from sklearn.cluster import MiniBatchKMeans
+        
+        history = self.chatbot.search_history
+        weighted = history.groupby('query', sort=False)['count'].sum()
+        n_clusters = min(5, len(history) // 2, len(weighted))
+        if len(history) < self.min_samples or n_clusters < 2:
+            return
+        queries = weighted.index.tolist()
+        weights = weighted.to_numpy(dtype=float)
+        X = self.vectorizer.transform(queries)
+        kmeans = MiniBatchKMeans(n_clusters=n_clusters, batch_size=self.batch_size, random_state=42)
+        kmeans.fit(X, sample_weight=weights)
+        self.kmeans = kmeans
+        self.weights = dict(zip(queries, weights))
+        self._relabel()
+        self._publish()
+        print(f"Online training started with {int(weights.sum())} weighted queries")
+    
+    def _update(self, batch):
+        queries = [query for query, _ in batch]
+        # The published model is read concurrently; update a copy of it
+        kmeans = copy.deepcopy(self.kmeans)
+        kmeans.partial_fit(self.vectorizer.transform(queries))
+        self.kmeans = kmeans
+        for query in queries:
+            self.weights[query] = self.weights.get(query, 0) + 1
+        self._since_relabel += len(batch)
+        if self._since_relabel >= max(self.relabel_every, len(self.weights) // 10):
+            self._relabel()
+        else:
+            # Only the new queries move; the rest keep their labels until the next relabel
+            queries = list(dict.fromkeys(queries))
+            for query, label in zip(queries, self.kmeans.predict(self.vectorizer.transform(queries))):
+                self.labels[query] = label
+                weight = self.weights[query]
+                best = self.best.get(label)
+                if best is None or best[1] == query or weight > best[0]:
+                    self.best[label] = (weight, query)
+        self._publish(batch)
+    
+    def _relabel(self):
+        """Assign every known query to its current nearest centroid"""
+        queries = list(self.weights)
+        labels = np.concatenate([
+            self.kmeans.predict(self.vectorizer.transform(queries[start:start + self.batch_size]))
+            for start in range(0, len(queries), self.batch_size)
+        ])
+        weights = np.fromiter(self.weights.values(), dtype=float, count=len(queries))
+        self.labels = dict(zip(queries, labels))
+        representatives = cluster_representatives(queries, weights, labels)
+        self.best = {self.labels[q]: (self.weights[q], q) for q in representatives}
+        self._since_relabel = 0
+    
+    def _publish(self, batch=()):
+        # A query that changed cluster can lead its old one until the next relabel
+        common_queries = list(dict.fromkeys(self.best[label][1] for label in sorted(self.best)))
+        with self.chatbot._publish_lock:
+            resources = self.chatbot._resources
+            suggestions = resources.get('suggestions')
+            if (suggestions is None or resources.get('vectorizer') is not self.vectorizer
+                    or resources.get('common_queries') != common_queries):
+                history = self.chatbot.search_history
+                suggestions = update_suggestion_table(
+                    {}, self.vectorizer, common_queries,
+                    history['query'].tolist(), history['destination'].tolist())
+            elif batch:
+                suggestions = update_suggestion_table(dict(suggestions), self.vectorizer, common_queries,
+                                                      [query for query, _ in batch],
+                                                      [destination for _, destination in batch])
+            self.chatbot._resources = dict(resources, vectorizer=self.vectorizer, kmeans=self.kmeans,
+                                           common_queries=common_queries, suggestions=suggestions)
+
+def update_suggestion_table(table, vectorizer, common_queries, queries, destinations,
+                            threshold=SUGGESTION_THRESHOLD):
+    """Add the common queries similar to `queries` to their destinations' entries.
+    
+    `table` maps a destination to the common queries, in their own order,
+    whose cosine similarity to one of its queries exceeds `threshold`. All
+    pairs come from one sparse product; the table is updated in place and
+    returned. Entries are replaced, never changed, so updating a shallow
+    copy leaves the original table as it was.
+    """
+    from scipy import sparse
+    
+    rows = [(query, destination) for query, destination in zip(queries, destinations)
+            if isinstance(destination, str) and destination]
+    if not rows or not common_queries:
+        return table
+    # Vectors are l2-normalized, so dot products are cosine similarities
+    common_vectors = vectorizer.transform(common_queries)
+    query_vectors = vectorizer.transform([query for query, _ in rows])
+    similar = (common_vectors @ query_vectors.T) > threshold
+    codes, names = pd.factorize(pd.Series([destination for _, destination in rows]))
+    by_destination = sparse.csr_matrix((np.ones(len(rows)), (np.arange(len(rows)), codes)),
+                                       shape=(len(rows), len(names)))
+    hits = (similar.astype(np.float64) @ by_destination).toarray() > 0
+    for j in np.flatnonzero(hits.any(axis=0)):
+        destination = names[j]
+        known = set(table.get(destination, ()))
+        table[destination] = [query for i, query in enumerate(common_queries)
+                              if hits[i, j] or query in known]
+    return table
+
+def cluster_representatives(queries, weights, labels):
+    """The most frequent query of each cluster, in cluster order"""
+    clusters = pd.DataFrame({'query': queries, 'count': weights, 'cluster': labels})
+    representatives = (clusters.sort_values('count', ascending=False, kind='stable')
+                       .drop_duplicates('cluster')
+                       .sort_values('cluster'))
+    return representatives['query'].tolist()
@@ -0,0 +1,187 @@
+import datetime
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+# PROFILE=1 profiles every session; otherwise PROFILE_SAMPLE_RATE picks a
+# fraction of sessions, and ?profile=1 opts a single session in
+PROFILE_ALL = os.getenv("PROFILE", "") not in ("", "0")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Stack sampling period; 10ms keeps the overhead around a percent
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "10")) / 1000
+# Sampling stops here even if the profile is not stopped yet
+MAX_PROFILE_SECONDS = 120
+
+logger = logging.getLogger(__name__)
+
+# Running profilers by profiled thread id; a thread has at most one
+_active = {}
+_active_lock = threading.Lock()
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Periodically samples one thread's call stack from a helper thread.
+
+    Stacks are counted in the "folded" format (root;...;leaf count) read by
+    flamegraph.pl, speedscope and most flame graph viewers. Sampling keeps
+    the profiled code running at full speed, unlike a tracing profiler.
+    """
+
+    def __init__(self, tag, thread_id=None, interval=PROFILE_INTERVAL):
+        self.tag = tag
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self.started = None
+        self.elapsed = 0.0
+
+    def start(self):
+        with _active_lock:
+            if self.thread_id in _active:
+                raise RuntimeError(f"Thread {self.thread_id} is already profiled by {_active[self.thread_id].tag}")
+            _active[self.thread_id] = self
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="profiler")
+        self._thread.start()
+        return self
+
+    def _run(self):
+        deadline = time.monotonic() + MAX_PROFILE_SECONDS
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        with _active_lock:
+            if _active.get(self.thread_id) is self:
+                del _active[self.thread_id]
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    def write(self, directory=PROFILE_DIR, session_id=''):
+        """Write the folded stacks to `directory`; returns the file path (None if empty)"""
+        if not self.stacks:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        tag = re.sub(r'[^A-Za-z0-9_.-]+', '_', self.tag)[:80]
+        path = os.path.join(directory, f"{stamp}-{session_id}-{tag}.folded")
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+def active(thread_id=None):
+    """The profiler running on a thread (the calling one by default), or None"""
+    with _active_lock:
+        return _active.get(thread_id or threading.get_ident())
+
+
+def start(tag):
+    """Start profiling the calling thread; pair with `stop`.
+
+    Raises RuntimeError if the thread is already being profiled.
+    """
+    return SamplingProfiler(tag).start()
+
+
+def stop(profiler, session_id=''):
+    """Stop a profiler from `start` and write its profile"""
+    profiler.stop()
+    path = profiler.write(session_id=session_id)
+    if path:
+        logger.info("Profile %s: %d samples over %.2fs -> %s", profiler.tag, profiler.samples, profiler.elapsed, path)
+    return path
+
+
+@contextmanager
+def profile(tag, enabled=True, session_id=''):
+    """Profile the enclosed block when `enabled`.
+
+    Inside another profile of the same thread the enclosing sampler already
+    covers the block, so no second one is started.
+    """
+    if not enabled or active() is not None:
+        yield
+        return
+    profiler = start(tag)
+    try:
+        yield
+    finally:
+        stop(profiler, session_id)
+
+
+def session_profiling(state, query_value=None):
+    """Decide once per session whether it is profiled; returns (enabled, session_id).
+
+    `state` is the session's state mapping; the sampling decision is kept in
+    it so a session is either profiled on every rerun or not at all.
+    """
+    if 'profile_session' not in state:
+        sampled = PROFILE_ALL or random.random() < PROFILE_SAMPLE_RATE
+        state['profile_session'] = (sampled, uuid.uuid4().hex[:8])
+    sampled, session_id = state['profile_session']
+    return sampled or query_value == '1', session_id
+
+
+def _is_widget_value(value):
+    return isinstance(value, (bool, int, float, str, tuple, datetime.date))
+
+
+def triggering_widget(values, previous):
+    """Best guess at the widget behind a rerun, from two snapshots of widget values.
+
+    A button is True only on the rerun it triggered, so keys that just
+    became True win; otherwise the first changed value is the trigger.
+    """
+    changed = [key for key, value in values.items() if previous.get(key) != value]
+    pressed = [key for key in changed if values[key] is True]
+    if pressed:
+        return pressed[0]
+    # Buttons drop back to False on the next rerun; that is not a trigger
+    others = [key for key in changed if not (values[key] is False and previous.get(key) is True)]
+    if others:
+        return others[0]
+    return 'rerun'
+
+
+def widget_snapshot(state):
+    """Plain widget-like values from the session state, for `triggering_widget`"""
+    snapshot = {}
+    for key in list(state.keys()):
+        if str(key).startswith('profile_'):
+            continue
+        try:
+            value = state[key]
+        except Exception:
+            continue
+        if _is_widget_value(value):
+            snapshot[key] = value
+    return snapshot
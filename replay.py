@@ -0,0 +1,320 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from urllib.parse import parse_qsl, quote, urlencode, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from http_client import endpoint_of as route_of
+
+# Never part of a recording key and never written to disk
+SECRET_PARAMS = frozenset({'key', 'client_id', 'client_secret'})
+# Response headers worth keeping in a recording
+KEPT_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Retry-After')
+
+logger = logging.getLogger(__name__)
+
+
+def request_key(method, url):
+    """Stable file name for a request: method, host, path and non-secret query params"""
+    parts = urlsplit(url)
+    params = sorted((k, v) for k, v in parse_qsl(parts.query) if k not in SECRET_PARAMS)
+    canonical = f"{method} {parts.netloc}{parts.path}?{urlencode(params)}"
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+def _params(url):
+    return dict(parse_qsl(urlsplit(url).query))
+
+
+def _json(payload, status=200):
+    return status, {'Content-Type': 'application/json'}, json.dumps(payload)
+
+
+def _rng(url):
+    # Same request, same synthetic answer
+    return random.Random(hashlib.sha1(url.encode('utf-8')).hexdigest())
+
+
+CARRIERS = ['AA', 'DL', 'UA', 'B6', 'AS', 'BA', 'AF', 'LH']
+# City centre used when a synthetic destination has no better position
+_CENTER = (47.6062, -122.3321)
+
+
+def _synthetic_flight_offers(url):
+    params = _params(url)
+    rng = _rng(url)
+    day = datetime.strptime(params.get('departureDate', '2025-01-01'), '%Y-%m-%d')
+    origin = params.get('originLocationCode', 'AAA')
+    destination = params.get('destinationLocationCode', 'BBB')
+    offers = []
+    for i in range(int(params.get('max', 50))):
+        carrier = rng.choice(CARRIERS)
+        depart = day + timedelta(minutes=rng.randrange(5 * 60, 23 * 60, 5))
+        stops = rng.choice([0, 0, 1, 1, 2])
+        hops = [origin] + [rng.choice(['ORD', 'DEN', 'ATL', 'DFW', 'JFK']) for _ in range(stops)] + [destination]
+        segments, at = [], depart
+        for j in range(len(hops) - 1):
+            arrive = at + timedelta(minutes=rng.randrange(60, 360, 5))
+            segments.append({
+                'departure': {'iataCode': hops[j], 'at': at.isoformat()},
+                'arrival': {'iataCode': hops[j + 1], 'at': arrive.isoformat()},
+                'carrierCode': carrier,
+                'number': str(rng.randrange(100, 9999)),
+            })
+            at = arrive + timedelta(minutes=rng.randrange(45, 180, 5))
+        minutes = int((arrive - depart).total_seconds() // 60)
+        offers.append({
+            'id': str(i + 1),
+            'price': {'currency': 'USD', 'total': f"{rng.uniform(90, 1400):.2f}"},
+            'validatingAirlineCodes': [carrier],
+            'itineraries': [{'duration': f"PT{minutes // 60}H{minutes % 60}M", 'segments': segments}],
+        })
+    return _json({'data': offers})
+
+
+def _synthetic_hotels(url):
+    params = _params(url)
+    rng = _rng(url)
+    city = params.get('cityCode', 'XXX')
+    radius = float(params.get('radius', 25))
+    hotels = []
+    for i in range(60):
+        lat = _CENTER[0] + rng.uniform(-0.15, 0.15)
+        lon = _CENTER[1] + rng.uniform(-0.2, 0.2)
+        hotels.append({
+            'hotelId': f"{city[:2]}RP{i:04d}",
+            'name': f"{city} Replay Hotel {i + 1}",
+            'geoCode': {'latitude': lat, 'longitude': lon},
+            'distance': {'value': round(rng.uniform(0.2, radius), 2), 'unit': 'KM'},
+            'rating': rng.choice([3, 4, 5]),
+        })
+    return _json({'data': hotels})
+
+
+def _synthetic_hotel_offers(url):
+    rng = _rng(url)
+    data = []
+    for hotel_id in _params(url).get('hotelIds', '').split(','):
+        if hotel_id and rng.random() < 0.8:
+            data.append({
+                'hotel': {'hotelId': hotel_id},
+                'available': True,
+                'offers': [{'price': {'currency': 'USD', 'total': f"{rng.uniform(70, 600):.2f}"}}],
+            })
+    return _json({'data': data})
+
+
+def _synthetic_places(url):
+    rng = _rng(url)
+    query = _params(url).get('query', 'top attractions')
+    city = query.replace('top attractions in ', '')
+    results = []
+    for i in range(8):
+        results.append({
+            'name': f"{city} Landmark {i + 1}",
+            'rating': round(rng.uniform(3.8, 4.9), 1),
+            'formatted_address': f"{i + 1} Main Street, {city}",
+            'place_id': f"replay-{hashlib.sha1(f'{city}{i}'.encode()).hexdigest()[:12]}",
+            'geometry': {'location': {'lat': _CENTER[0] + rng.uniform(-0.05, 0.05),
+                                      'lng': _CENTER[1] + rng.uniform(-0.05, 0.05)}},
+        })
+    return _json({'status': 'OK', 'results': results})
+
+
+def _synthetic_search(url):
+    query = _params(url).get('q', '')
+    slug = quote(query.replace(' ', '-'))
+    links = ''.join(
+        f'<a href="/url?q=https://travel{i}.example.com/{slug}&amp;sa=U">Result {i}</a>' for i in range(10)
+    )
+    return 200, {'Content-Type': 'text/html; charset=utf-8'}, f"<html><body>{links}</body></html>"
+
+
+def _synthetic_page(url):
+    rng = _rng(url)
+    words = ("travel guide hotel museum beach food market tour park view local history "
+             "festival street coffee bridge garden night").split()
+    paragraphs = ''.join(
+        '<p>' + ' '.join(rng.choice(words) for _ in range(30)).capitalize() + '.</p>' for _ in range(20)
+    )
+    path = urlsplit(url).path.strip('/').replace('-', ' ') or 'travel'
+    html = (f"<html><head><title>{path.title()}</title><script>var x = 1;</script></head>"
+            f"<body><nav><a href='/'>Home</a></nav><article>{paragraphs}</article></body></html>")
+    headers = {'Content-Type': 'text/html; charset=utf-8',
+               'ETag': '"' + hashlib.sha1(html.encode('utf-8')).hexdigest()[:16] + '"'}
+    return 200, headers, html
+
+
+SYNTHETIC = {
+    'token': lambda url: _json({'access_token': 'replay-token', 'expires_in': 1799, 'token_type': 'Bearer'}),
+    'locations': lambda url: _json({'data': [{'iataCode': _params(url).get('keyword', 'XXX')[:3].upper()}]}),
+    'flight_offers': _synthetic_flight_offers,
+    'hotels': _synthetic_hotels,
+    'hotel_offers': _synthetic_hotel_offers,
+    'places': _synthetic_places,
+    'search': _synthetic_search,
+    'page': _synthetic_page,
+}
+
+
+def _build_response(request, status, headers, body):
+    response = requests.Response()
+    response.status_code = status
+    response.headers = CaseInsensitiveDict(headers)
+    response.encoding = get_encoding_from_headers(response.headers)
+    content = body.encode('utf-8') if isinstance(body, str) else body
+    # Marked consumed so iter_content() replays the body in chunks
+    response._content = content
+    response._content_consumed = True
+    response.raw = io.BytesIO(content)
+    response.url = request.url
+    response.request = request
+    response.reason = 'OK' if status < 400 else 'Replayed error'
+    return response
+
+
+class ReplayAdapter(BaseAdapter):
+    """Transport adapter that answers requests from recordings instead of the network.
+
+    A request is served from `<fixtures_dir>/<route>/<key>.json` if it was
+    recorded, else from `<route>/default.json`, else from a synthetic
+    response shaped like the real API. `latency` (seconds, or a dict per
+    route) is applied with +/-50% jitter and respects the request's read
+    timeout; `error_rate` answers with 503 and `drop_rate` raises a
+    connection error. `counts` tallies calls per route.
+    """
+
+    def __init__(self, fixtures_dir=None, latency=0.0, error_rate=0.0, drop_rate=0.0, seed=None):
+        super().__init__()
+        self.fixtures_dir = fixtures_dir
+        self.latency = latency
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.counts = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _load(self, route, key):
+        if not self.fixtures_dir:
+            return None
+        for name in (key, 'default'):
+            path = os.path.join(self.fixtures_dir, route, f"{name}.json")
+            if os.path.exists(path):
+                with open(path, encoding='utf-8') as f:
+                    fixture = json.load(f)
+                return fixture['status'], fixture['headers'], fixture['body']
+        return None
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        route = route_of(request.url)
+        with self._lock:
+            self.counts[route] += 1
+            jitter = self._random.uniform(0.5, 1.5)
+            roll = self._random.random()
+        latency = self.latency.get(route, 0.0) if isinstance(self.latency, dict) else self.latency
+        delay = latency * jitter
+        read_timeout = timeout[1] if isinstance(timeout, tuple) else timeout
+        if read_timeout is not None and delay > read_timeout:
+            time.sleep(read_timeout)
+            raise requests.ReadTimeout(f"Replayed {route} took longer than {read_timeout}s", request=request)
+        time.sleep(delay)
+
+        if roll < self.drop_rate:
+            raise requests.ConnectionError(f"Injected connection failure for {route}", request=request)
+        if roll < self.drop_rate + self.error_rate:
+            return _build_response(request, 503, {'Content-Type': 'text/plain'}, 'Injected upstream error')
+
+        fixture = self._load(route, request_key(request.method, request.url))
+        if fixture is None:
+            fixture = SYNTHETIC[route](request.url)
+        return _build_response(request, *fixture)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts)
+
+    def close(self):
+        pass
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Live transport that also writes each response as a ReplayAdapter fixture"""
+
+    def __init__(self, fixtures_dir, **kwargs):
+        super().__init__(**kwargs)
+        self.fixtures_dir = fixtures_dir
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        if kwargs.get('stream'):
+            # Record the body as the caller reads it; buffering it here
+            # would defeat streaming and skew the timings being recorded
+            response.iter_content = self._recording(request, response, response.iter_content)
+        else:
+            self._record(request, response, response.content)
+        return response
+
+    def _recording(self, request, response, iter_content):
+        def iter_and_record(*args, **kwargs):
+            chunks = []
+            try:
+                for chunk in iter_content(*args, **kwargs):
+                    chunks.append(chunk.encode(response.encoding or 'utf-8') if isinstance(chunk, str) else chunk)
+                    yield chunk
+            finally:
+                # Pages read only partway are recorded as far as they were read
+                self._record(request, response, b''.join(chunks))
+        return iter_and_record
+
+    def _record(self, request, response, content):
+        route = route_of(request.url)
+        body = content.decode(response.encoding or 'utf-8', errors='replace')
+        if route == 'token' and response.status_code == 200:
+            # Keep the shape of the token answer, not the token itself
+            body = json.dumps({**json.loads(body), 'access_token': 'recorded-token'})
+        fixture = {
+            'url': request.url.split('?')[0],
+            'status': response.status_code,
+            'headers': {h: response.headers[h] for h in KEPT_HEADERS if h in response.headers},
+            'body': body,
+        }
+        directory = os.path.join(self.fixtures_dir, route)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{request_key(request.method, request.url)}.json")
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(fixture, f)
+        os.replace(f"{path}.tmp", path)
+
+
+def install(client, adapter):
+    """Route every request `client` makes through `adapter`"""
+    client.close()
+    client.adapter = adapter
+
+
+def install_from_env(client):
+    """Set up replay or recording from HTTP_REPLAY_DIR / HTTP_RECORD_DIR"""
+    record_dir = os.getenv("HTTP_RECORD_DIR")
+    if record_dir:
+        install(client, RecordingAdapter(record_dir, pool_maxsize=client.pool_size))
+        logger.info("Recording upstream responses to %s", record_dir)
+        return
+    adapter = ReplayAdapter(
+        os.getenv("HTTP_REPLAY_DIR"),
+        latency=float(os.getenv("HTTP_REPLAY_LATENCY", "0")),
+        error_rate=float(os.getenv("HTTP_REPLAY_ERROR_RATE", "0")),
+        drop_rate=float(os.getenv("HTTP_REPLAY_DROP_RATE", "0")),
+    )
+    install(client, adapter)
+    logger.info("Replaying upstream responses from %s", adapter.fixtures_dir or 'synthetic fixtures')
@@ -0,0 +1,214 @@
+import copy
+import datetime
+import functools
+import inspect
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+# Seconds a response stays fresh, per endpoint. Fares change quickly; hotel
+# lists and city codes hardly ever do.
+TTLS = {
+    'flight_offers': 5 * 60,
+    'fare_day': 5 * 60,
+    'hotels': 24 * 60 * 60,
+    'hotel_offers': 15 * 60,
+    'locations': 7 * 24 * 60 * 60,
+}
+DEFAULT_TTL = 10 * 60
+# Expired rows are deleted from the SQLite tier at most this often
+PURGE_SECONDS = 60 * 60
+
+MISSING = object()
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(endpoint, params):
+    """Build a cache key from an endpoint name and its request parameters"""
+    normalized = {}
+    for name, value in params.items():
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            value = value.isoformat()
+        elif isinstance(value, str):
+            value = value.strip().casefold()
+        normalized[name] = value
+    return f"{endpoint}:{json.dumps(normalized, sort_keys=True, default=str)}"
+
+
+class ResponseCache:
+    """Bounded in-memory LRU with per-entry expiry and an optional SQLite tier.
+
+    The SQLite file (if `db_path` is given) keeps entries across process
+    restarts; memory misses fall through to it before going to the network.
+    Values are copied in and out, so callers can change what they get back.
+    """
+
+    def __init__(self, max_entries=2048, db_path=None, purge_seconds=PURGE_SECONDS):
+        self.max_entries = max_entries
+        self.purge_seconds = purge_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Serializes use of the SQLite connection, apart from the memory tier
+        self._db_lock = threading.Lock()
+        self._stats = {}
+        self._db = None
+        self._next_purge = 0.0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, expires REAL, value TEXT)"
+            )
+            self._db.commit()
+            self.purge_expired()
+
+    def _count(self, endpoint, field):
+        counters = self._stats.setdefault(endpoint, {'hits': 0, 'disk_hits': 0, 'misses': 0})
+        counters[field] += 1
+
+    def get(self, endpoint, key):
+        """Return the cached value, or MISSING if absent or expired"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self._count(endpoint, 'hits')
+                    return copy.deepcopy(value)
+                del self._entries[key]
+
+        if self._db is not None:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT expires, value FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+            if row and row[0] > now:
+                value = json.loads(row[1])
+                with self._lock:
+                    self._store(key, row[0], copy.deepcopy(value))
+                    self._count(endpoint, 'disk_hits')
+                return value
+
+        with self._lock:
+            self._count(endpoint, 'misses')
+        return MISSING
+
+    def set(self, endpoint, key, value, ttl=None):
+        ttl = TTLS.get(endpoint, DEFAULT_TTL) if ttl is None else ttl
+        now = time.time()
+        expires = now + ttl
+        with self._lock:
+            self._store(key, expires, copy.deepcopy(value))
+        if self._db is None:
+            return
+        try:
+            row = (key, expires, json.dumps(value))
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, expires, value) VALUES (?, ?, ?)", row
+                )
+                self._db.commit()
+        except (TypeError, sqlite3.Error) as e:
+            logger.warning("Could not persist cache entry %s: %s", key, e)
+        if now >= self._next_purge:
+            self.purge_expired()
+
+    def _store(self, key, expires, value):
+        self._entries[key] = (expires, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def purge_expired(self):
+        """Drop expired entries from memory and disk; runs on open and then every purge_seconds"""
+        now = time.time()
+        self._next_purge = now + self.purge_seconds
+        with self._lock:
+            for key in [k for k, (expires, _) in self._entries.items() if expires <= now]:
+                del self._entries[key]
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM responses WHERE expires <= ?", (now,))
+                self._db.commit()
+
+    def stats(self):
+        """Hit/miss counters per endpoint, plus the overall hit rate"""
+        with self._lock:
+            per_endpoint = {name: dict(counters) for name, counters in self._stats.items()}
+            size = len(self._entries)
+        hits = sum(c['hits'] + c['disk_hits'] for c in per_endpoint.values())
+        total = hits + sum(c['misses'] for c in per_endpoint.values())
+        return {
+            'endpoints': per_endpoint,
+            'entries': size,
+            'hit_rate': hits / total if total else 0.0,
+        }
+
+
+# Shared by every session in the process. Set RESPONSE_CACHE_DB to a file
+# path to keep responses across restarts.
+default_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "2048")),
+    db_path=os.getenv("RESPONSE_CACHE_DB"),
+)
+
+
+def _metric_samples():
+    stats = default_cache.stats()
+    samples = [('response_cache_entries', {}, stats['entries']),
+               ('response_cache_hit_ratio', {}, stats['hit_rate'])]
+    for endpoint, counters in stats['endpoints'].items():
+        for outcome, count in counters.items():
+            samples.append(('response_cache_lookups', {'endpoint': endpoint, 'outcome': outcome}, count))
+    return samples
+
+
+metrics.register_collector('response_cache', _metric_samples)
+
+
+def cached(endpoint, ttl=None, cache=None):
+    """Decorator caching a function's result by its normalized arguments.
+
+    Results shaped like `{"error": ...}` are never cached, so failures are
+    retried on the next call.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        def key_of(args, kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return make_key(endpoint, bound.arguments)
+
+        def lookup(*args, **kwargs):
+            """The cached result for these arguments, or MISSING"""
+            return (cache or default_cache).get(endpoint, key_of(args, kwargs))
+
+        def refresh(*args, **kwargs):
+            """Call the function and cache its result, without looking in the cache first"""
+            value = func(*args, **kwargs)
+            if not (isinstance(value, dict) and "error" in value):
+                (cache or default_cache).set(endpoint, key_of(args, kwargs), value, ttl)
+            return value
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            value = lookup(*args, **kwargs)
+            if value is not MISSING:
+                return value
+            return refresh(*args, **kwargs)
+
+        # Let callers such as the fare calendar spend rate budget only on misses
+        wrapper.lookup = lookup
+        wrapper.refresh = refresh
+        return wrapper
+    return decorator
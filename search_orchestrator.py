@@ -0,0 +1,54 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import http_client
+
+# Seconds each provider gets before the search moves on without it
+SEARCH_DEADLINE = float(os.getenv("SEARCH_DEADLINE", "12"))
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", "8"))
+
+# Shared across sessions so the number of in-flight upstream calls stays bounded
+_executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="search")
+
+
+def _bounded(func, seconds):
+    # Upstream requests give up at the deadline, so a worker is not held
+    # by a hung provider after the search has moved on
+    with http_client.deadline(seconds):
+        return func()
+
+
+def run_search(tasks, deadline=SEARCH_DEADLINE, deadlines=None):
+    """Run independent provider calls concurrently and collect what finishes in time.
+
+    `tasks` maps a name (e.g. 'flights') to a zero-argument callable. Every
+    task is started at once; each one is awaited until its own deadline
+    (`deadlines[name]`, defaulting to `deadline`) measured from the start of
+    the search, so the total wait is the slowest deadline, not the sum.
+    The task's upstream requests are bounded by the same deadline, so a
+    task that misses it frees its worker soon after.
+
+    Returns `(results, timed_out)`. Tasks that raise or miss their deadline
+    get an `{"error": ...}` result like the API functions return, and the
+    names of the ones that timed out are listed in `timed_out`.
+    """
+    deadlines = deadlines or {}
+    start = time.monotonic()
+    futures = {name: _executor.submit(_bounded, func, deadlines.get(name, deadline))
+               for name, func in tasks.items()}
+
+    results = {}
+    timed_out = []
+    # Wait on the earliest deadlines first so none is extended by another
+    for name in sorted(futures, key=lambda n: deadlines.get(n, deadline)):
+        remaining = start + deadlines.get(name, deadline) - time.monotonic()
+        try:
+            results[name] = futures[name].result(timeout=max(0, remaining))
+        except TimeoutError:
+            # The call runs on until its requests hit the deadline; its result is discarded
+            timed_out.append(name)
+            results[name] = {"error": f"The {name} search took too long. Please try again."}
+        except Exception as e:
+            results[name] = {"error": f"The {name} search failed: {str(e)}"}
+    return results, timed_out
@@ -0,0 +1,215 @@
+import os
+import threading
+
+import numpy as np
+
+# Corpora at least this large are searched through LSH buckets instead of
+# scoring every row
+LSH_THRESHOLD = int(os.getenv("SIMILAR_LSH_THRESHOLD", "50000"))
+# Rows added since the last build are scored exactly; they are folded into
+# the main matrix and buckets once there are this many, or a tenth of it
+MERGE_EVERY = 1024
+
+_MASK = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+def make_vectorizer(n_features=2 ** 18):
+    """Stateless l2-normalized word/bigram hashing, so rows can be added at any time"""
+    from sklearn.feature_extraction.text import HashingVectorizer
+    return HashingVectorizer(ngram_range=(1, 2), n_features=n_features, stop_words='english',
+                             alternate_sign=False)
+
+
+def _mix(x):
+    # splitmix64 finalizer: a cheap, well-spread hash of uint64 arrays
+    x = (x + np.uint64(0x9E3779B97F4A7C15)) & _MASK
+    x = ((x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)) & _MASK
+    x = ((x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)) & _MASK
+    return x ^ (x >> np.uint64(31))
+
+
+class SimilarityIndex:
+    """Cosine nearest-neighbor search over short texts, each tagged with a destination.
+
+    Texts are hashed into l2-normalized sparse vectors, so a dot product is
+    their cosine similarity. Small corpora are scored exactly with one
+    sparse product. From `lsh_threshold` rows on, random-hyperplane LSH
+    narrows the search to the rows sharing a bucket with the query in any
+    of `n_tables` tables (probing the `probes` least certain bits as well),
+    and only those are scored. Hyperplane signs are derived from a hash of
+    the feature id, so no projection matrix is stored.
+    """
+
+    def __init__(self, lsh_threshold=LSH_THRESHOLD, n_tables=16, n_bits=10, probes=2, seed=42):
+        self.lsh_threshold = lsh_threshold
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.probes = probes
+        self.seed = seed
+        self.vectorizer = make_vectorizer()
+        self._lock = threading.Lock()
+        self.queries = []
+        self._destination_codes = []
+        self._destination_ids = {}
+        self._keys = set()
+        self._matrix = None
+        self._code_array = np.zeros(0, dtype=np.int64)
+        self._pending = []
+        self._pending_matrix = None
+        self._buckets = None
+        self._codes = None
+
+    def __len__(self):
+        return len(self.queries)
+
+    def build(self, queries, destinations):
+        """Index (query, destination) pairs, replacing the current contents"""
+        from scipy import sparse
+
+        with self._lock:
+            self.queries = []
+            self._destination_codes = []
+            self._keys = set()
+            for query, destination in zip(queries, destinations):
+                self._append(query, destination)
+            self._matrix = (self.vectorizer.transform(self.queries) if self.queries
+                            else sparse.csr_matrix((0, self.vectorizer.n_features)))
+            self._pending = []
+            self._pending_matrix = None
+            self._codes = None
+            self._reindex()
+        return self
+
+    def add(self, query, destination=None):
+        """Index one more pair; pairs already indexed are skipped"""
+        vector = self.vectorizer.transform([query])
+        with self._lock:
+            if not self._append(query, destination):
+                return
+            self._pending.append(vector)
+            self._pending_matrix = None
+            if len(self._pending) >= max(MERGE_EVERY, self._matrix.shape[0] // 10):
+                self._merge()
+
+    def _append(self, query, destination):
+        if not isinstance(destination, str) or not destination:
+            destination = None
+        if (query, destination) in self._keys:
+            return False
+        self._keys.add((query, destination))
+        self.queries.append(query)
+        code = self._destination_ids.setdefault(destination, len(self._destination_ids))
+        self._destination_codes.append(code)
+        return True
+
+    def _merge(self):
+        from scipy import sparse
+
+        self._matrix = sparse.vstack([self._matrix] + self._pending, format='csr')
+        self._pending = []
+        self._pending_matrix = None
+        self._reindex()
+
+    def _signs(self, features):
+        """+-1 hyperplane coefficients of the given feature ids, one column per bit"""
+        planes = self.n_tables * self.n_bits
+        keys = (features.astype(np.uint64)[:, None] * np.uint64(planes)
+                + np.arange(planes, dtype=np.uint64)[None, :] + np.uint64(self.seed)) & _MASK
+        return np.where(_mix(keys) >> np.uint64(63), 1.0, -1.0).astype(np.float32)
+
+    def _project(self, X):
+        """Projections of the rows of X onto every hyperplane"""
+        from scipy import sparse
+
+        X = X.tocsr()
+        features, columns = np.unique(X.indices, return_inverse=True)
+        compact = sparse.csr_matrix((X.data, columns.reshape(-1), X.indptr),
+                                    shape=(X.shape[0], len(features)))
+        return np.asarray(compact @ self._signs(features))
+
+    def _bucket_codes(self, projections):
+        bits = (projections > 0).reshape(len(projections), self.n_tables, self.n_bits)
+        return bits.astype(np.int64) @ (1 << np.arange(self.n_bits, dtype=np.int64))
+
+    def _reindex(self):
+        """Rebuild the LSH buckets, hashing only rows that are not hashed yet"""
+        n = self._matrix.shape[0]
+        self._code_array = np.asarray(self._destination_codes[:n], dtype=np.int64)
+        if n < self.lsh_threshold:
+            self._buckets = None
+            return
+        done = 0 if self._codes is None else len(self._codes)
+        parts = [] if self._codes is None else [self._codes]
+        # Chunks bound the size of the dense projection block
+        for start in range(done, n, 20000):
+            parts.append(self._bucket_codes(self._project(self._matrix[start:start + 20000])))
+        self._codes = np.concatenate(parts)
+        # Per table: row ids ordered by bucket code, and the sorted codes to search
+        order = np.argsort(self._codes, axis=0, kind='stable')
+        self._buckets = (order.T.copy(), np.take_along_axis(self._codes, order, axis=0).T.copy())
+
+    def _candidates(self, vector):
+        projections = self._project(vector)[0].reshape(self.n_tables, self.n_bits)
+        codes = self._bucket_codes(projections.reshape(1, -1))[0]
+        # Also visit the buckets across the hyperplanes the query is closest to
+        uncertain = np.argsort(np.abs(projections), axis=1)[:, :self.probes]
+        order, sorted_codes = self._buckets
+        found = []
+        for table in range(self.n_tables):
+            probes = [codes[table]] + [codes[table] ^ (1 << int(bit)) for bit in uncertain[table]]
+            for code in probes:
+                lo, hi = np.searchsorted(sorted_codes[table], [code, code + 1])
+                found.append(order[table, lo:hi])
+        return np.unique(np.concatenate(found))
+
+    def search(self, text, destination=None, k=5, min_score=0.0, exact=False):
+        """Up to `k` (cosine similarity, query) pairs, most similar first.
+
+        `destination` limits the search to queries recorded for it. `exact`
+        scores every row even when the corpus is large enough for LSH.
+        """
+        from scipy import sparse
+
+        vector = self.vectorizer.transform([text])
+        with self._lock:
+            if not self.queries or vector.nnz == 0:
+                return []
+            code = None
+            if destination:
+                code = self._destination_ids.get(destination)
+                if code is None:
+                    return []
+            n = self._matrix.shape[0]
+            if self._buckets is None or exact:
+                rows = np.arange(n) if code is not None else None
+            else:
+                rows = self._candidates(vector)
+            if code is not None:
+                rows = rows[self._code_array[rows] == code]
+            matrix = self._matrix if rows is None else self._matrix[rows]
+            ids = [np.arange(n) if rows is None else rows]
+            scores = [(matrix @ vector.T).toarray().ravel()]
+            # Rows added since the last merge are always scored exactly
+            if self._pending:
+                if self._pending_matrix is None:
+                    self._pending_matrix = sparse.vstack(self._pending, format='csr')
+                pending = np.arange(n, len(self.queries))
+                if code is not None:
+                    pending_codes = np.asarray(self._destination_codes[n:], dtype=np.int64)
+                    pending = pending[pending_codes == code]
+                ids.append(pending)
+                scores.append((self._pending_matrix[pending - n] @ vector.T).toarray().ravel())
+            ids = np.concatenate(ids)
+            scores = np.concatenate(scores)
+            keep = np.flatnonzero(scores > min_score)
+            hits = []
+            seen = set()
+            for i in keep[np.argsort(-scores[keep], kind='stable')]:
+                query = self.queries[ids[i]]
+                if query in seen:
+                    continue
+                seen.add(query)
+                hits.append((float(scores[i]), query))
+                if len(hits) == k:
+                    break
+        return hits
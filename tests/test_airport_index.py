@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+from airport_index import CITY, AirportIndex, MISS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def index():
+    return AirportIndex(os.path.join(ROOT, 'IATA_List.csv'), os.path.join(ROOT, 'USA_Airports_IATA.csv'))
+
+
+@pytest.mark.parametrize('name, code', [
+    # City codes, not the main airport's code
+    ('Orlando', 'ORL'), ('Detroit', 'DTT'), ('new york', 'NYC'),
+    # Resolved locally despite a namesake elsewhere or tied airports
+    ('Los Angeles', 'LAX'), ('Las Vegas', 'LAS'), ('Madrid', 'MAD'), ('Berlin', 'BER'),
+    ('Reykjavik', 'KEF'), ('Cleveland', 'CLE'),
+    # Partly typed
+    ('orla', 'ORL'),
+    # Typed as a code
+    ('SAN', 'SAN'), ('NEW', 'NEW'),
+])
+def test_lookup(index, name, code):
+    assert index.lookup(name) == code
+
+
+@pytest.mark.parametrize('name', ['San', 'new', 'Xyzzy', ''])
+def test_words_are_not_codes_and_unknown_names_miss(index, name):
+    assert index.lookup(name) is MISS
+
+
+def test_only_top_scoring_candidates_make_a_name_ambiguous(index):
+    # A regional namesake in another country does not block the match
+    assert index._best([(12, 'LAX'), (0, 'LSQ')]) == 'LAX'
+    # International airports of the same name in two countries do
+    assert index._best([(11, 'SYD'), (10, 'BLA')]) is None
+    # A listed city code beats any airport of the city
+    assert index._best([(12, 'MCO'), (CITY, 'ORL')]) == 'ORL'
+
+
+def test_learned_answers_win(index):
+    index.remember('Atlantis', None)
+    assert index.lookup('atlantis') is None
@@ -0,0 +1,36 @@
+import datetime
+
+from fare_calendar import fare_calendar
+from response_cache import ResponseCache, cached
+
+
+class CountingLimiter:
+    def __init__(self):
+        self.acquired = 0
+
+    def acquire(self):
+        self.acquired += 1
+
+
+def _offer(price):
+    return {'price': {'total': str(price)}, 'itineraries': [{'segments': [{'carrierCode': 'AA'}]}]}
+
+
+def test_cached_offers_cost_no_rate_budget_and_failures_stay_per_day():
+    days = [datetime.date.today() + datetime.timedelta(days=n) for n in range(5)]
+    failing = days[3].strftime('%Y-%m-%d')
+
+    @cached('flight_offers', cache=ResponseCache())
+    def offers(origin, destination, date):
+        if date == failing:
+            raise RuntimeError("upstream down")
+        return [_offer(120), _offer(99)]
+
+    # Already in fetch_offers' own cache
+    offers('DTW', 'HNL', days[0].strftime('%Y-%m-%d'))
+    limiter = CountingLimiter()
+    fares = fare_calendar(offers, 'DTW', 'HNL', days, limiter=limiter, cache=ResponseCache())
+
+    assert limiter.acquired == len(days) - 1
+    assert fares.loc[days[3], 'status'] == 'unavailable'
+    assert (fares.drop(index=days[3])['price'] == 99).all()
@@ -0,0 +1,16 @@
+import math
+
+from geo_index import DestinationGeo
+
+
+def test_center_distance_is_converted_to_km():
+    hotels = [
+        {'hotelId': 'A', 'distance': {'value': 2, 'unit': 'MILE'}},
+        {'hotelId': 'B', 'distance': {'value': 3, 'unit': 'KM'}},
+        {'hotelId': 'C', 'distance': {'value': 1, 'unit': 'FURLONG'}},
+        {'hotelId': 'D'},
+    ]
+    geo = DestinationGeo(hotels, [])
+    assert math.isclose(geo.center_km[0], 3.218688)
+    assert [hotel['hotelId'] for hotel, _ in geo.hotels_near_center(3.1)] == ['B']
+    assert [hotel['hotelId'] for hotel, _ in geo.hotels_near_center(100)] == ['B', 'A']
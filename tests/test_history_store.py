@@ -0,0 +1,19 @@
+from history_store import SearchHistoryStore
+
+
+def test_flushes_from_two_stores_add_up(tmp_path):
+    path = str(tmp_path / 'history.sqlite')
+    first = SearchHistoryStore(path, flush_seconds=3600)
+    second = SearchHistoryStore(path, flush_seconds=3600)
+    first.increment('best pizza', 'Chicago')
+    first.increment('best pizza', 'Chicago')
+    second.increment('best pizza', 'Chicago', 3)
+    second.increment('museums')
+    assert first.flush() == 1
+    assert second.flush() == 2
+    # Nothing pending: a second flush must not add the counts again
+    assert first.flush() == 0
+
+    reader = SearchHistoryStore(path, flush_seconds=3600)
+    assert reader.count('best pizza', 'Chicago') == 5
+    assert reader.count('museums') == 1
@@ -0,0 +1,28 @@
+import json
+import threading
+
+from knowledge_index import KnowledgeIndex
+
+
+def test_autosave_runs_off_the_adding_thread(tmp_path, monkeypatch):
+    path = tmp_path / 'index.json'
+    index = KnowledgeIndex(str(path), autosave_every=2)
+    saved = threading.Event()
+    save = index.save
+    savers = []
+
+    def recording_save():
+        savers.append(threading.current_thread().name)
+        save()
+        saved.set()
+
+    monkeypatch.setattr(index, 'save', recording_save)
+    index.add("Pike Place Market", "http://a", "Fresh seafood and flowers", "Seattle")
+    assert not path.exists()
+    index.add("Space Needle", "http://b", "Views over the city", "Seattle")
+    assert saved.wait(5)
+    assert savers == ['knowledge-save']
+    assert [doc['link'] for doc in json.loads(path.read_text())] == ['http://a', 'http://b']
+
+    reloaded = KnowledgeIndex(str(path))
+    assert reloaded.search("seafood market", "Seattle")[0][1]['link'] == 'http://a'
@@ -0,0 +1,97 @@
+import errno
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+from sklearn.cluster import KMeans
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer, TfidfVectorizer
+from sklearn.utils import murmurhash3_32 as sklearn_murmurhash3_32
+
+import model_artifact
+
+QUERIES = ["best pizza in Seattle", "cheap pizza near the beach", "art museums open late",
+           "free museums this weekend", "family friendly hotels", "hotels near the airport",
+           "best hiking trails", "easy hiking near town", "live jazz tonight", "jazz clubs with dinner"]
+PROBES = ["pizza and museums", "pizza pizza pizza", "late night jazz in Seattle", "nothing in common", ""]
+
+
+def resources(vectorizer):
+    X = vectorizer.fit_transform(QUERIES) if isinstance(vectorizer, TfidfVectorizer) \
+        else vectorizer.transform(QUERIES)
+    kmeans = KMeans(n_clusters=3, random_state=42, n_init=3).fit(X)
+    common = QUERIES[:3]
+    return {'vectorizer': vectorizer, 'kmeans': kmeans, 'common_queries': common,
+            'suggestions': {'Seattle': [common[0], common[2]], 'Miami': [common[1]]}}
+
+
+def assert_same_model(loaded, original):
+    expected = original['vectorizer'].transform(QUERIES + PROBES)
+    actual = loaded['vectorizer'].transform(QUERIES + PROBES)
+    assert np.allclose(actual.toarray(), expected.toarray())
+    assert np.array_equal(loaded['kmeans'].predict(actual), original['kmeans'].predict(expected))
+    assert loaded['common_queries'] == original['common_queries']
+    assert loaded['suggestions'] == original['suggestions']
+
+
+@pytest.mark.parametrize('vectorizer', [
+    TfidfVectorizer(ngram_range=(1, 2)),
+    TfidfVectorizer(use_idf=False),
+    TfidfVectorizer(binary=True, sublinear_tf=True),
+    HashingVectorizer(ngram_range=(1, 2), n_features=2 ** 10, alternate_sign=False),
+    HashingVectorizer(ngram_range=(1, 3), n_features=37, norm='l1'),
+])
+def test_round_trip(tmp_path, vectorizer):
+    original = resources(vectorizer)
+    version = model_artifact.save(str(tmp_path), original)
+    assert model_artifact.current_version(str(tmp_path)) == version
+    assert_same_model(model_artifact.load(str(tmp_path)), original)
+
+
+def test_unsupported_vectorizer_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        model_artifact.save(str(tmp_path), {'vectorizer': CountVectorizer().fit(QUERIES)})
+    assert model_artifact.current_version(str(tmp_path)) is None
+
+
+def test_rename_failure_is_raised_not_retried(tmp_path, monkeypatch):
+    def full_disk(src, dst):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(model_artifact.os, 'rename', full_disk)
+    with pytest.raises(OSError):
+        model_artifact.save(str(tmp_path), resources(TfidfVectorizer()))
+    assert os.listdir(tmp_path) == []
+
+
+def test_pruned_version_stays_readable(tmp_path):
+    directory = str(tmp_path)
+    original = resources(TfidfVectorizer(ngram_range=(1, 2)))
+    first = model_artifact.save(directory, original)
+    loaded = model_artifact.load(directory)
+    for _ in range(model_artifact.KEEP_VERSIONS + 1):
+        model_artifact.save(directory, original)
+    assert not os.path.exists(os.path.join(directory, f"v{first:06d}"))
+    assert_same_model(loaded, original)
+    # Saving what was loaded from the pruned version works too
+    model_artifact.save(directory, loaded)
+    assert_same_model(model_artifact.load(directory), original)
+
+
+def test_murmurhash_matches_scikit_learn():
+    for text in ["", "a", "ab", "abc", "abcd", "pizza", "best pizza", "café crème", "\U0001F355 slice"]:
+        data = text.encode('utf-8')
+        assert model_artifact.murmurhash3_32(data) == sklearn_murmurhash3_32(data)
+        assert model_artifact.murmurhash3_32(data, seed=42) == sklearn_murmurhash3_32(data, seed=42)
+
+
+def test_loading_a_hashing_model_does_not_import_scikit_learn(tmp_path):
+    model_artifact.save(str(tmp_path), resources(HashingVectorizer(n_features=2 ** 10, alternate_sign=False)))
+    script = (f"import sys, model_artifact\n"
+              f"resources = model_artifact.load({str(tmp_path)!r})\n"
+              f"resources['kmeans'].predict(resources['vectorizer'].transform(['best pizza']))\n"
+              f"print('sklearn' in sys.modules)")
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.stdout.split()[-1:] == ['False'], result.stderr
@@ -0,0 +1,27 @@
+import requests
+
+import web_search
+from page_cache import PageCache
+
+
+def test_opens_lazily_and_keys_queries_by_result_count(tmp_path):
+    path = tmp_path / 'pages.sqlite'
+    cache = PageCache(str(path))
+    assert not path.exists()
+    cache.put_urls('Best  pizza', ['http://a', 'http://b', 'http://c'], 3)
+    assert path.exists()
+    assert cache.get_urls('best pizza', 3) == ['http://a', 'http://b', 'http://c']
+    assert cache.get_urls('best pizza', 5) is None
+
+
+def test_stale_copy_is_served_when_revalidation_fails(tmp_path, monkeypatch):
+    cache = PageCache(str(tmp_path / 'pages.sqlite'), fresh_seconds=0)
+    cache.put_page('http://a', 'Pizza', 'The best slices in town')
+    monkeypatch.setattr(web_search, 'default_page_cache', cache)
+
+    def down(*args, **kwargs):
+        raise requests.ConnectionError("site down")
+
+    monkeypatch.setattr(web_search.http_client, 'get', down)
+    page = web_search.fetch_page('http://a')
+    assert page == {'title': 'Pizza', 'link': 'http://a', 'snippet': 'The best slices in town'}
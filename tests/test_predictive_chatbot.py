@@ -0,0 +1,116 @@
+import numpy as np
+
+from predictive_chatbot import PredictiveChatbot
+
+QUERIES = [
+    ("best pizza near the beach", "Miami"), ("cheap pizza downtown", "Miami"),
+    ("art museums open late", "Chicago"), ("free museums this weekend", "Chicago"),
+    ("family friendly hotels", "Seattle"), ("hotels near the airport", "Seattle"),
+    ("best hiking trails", "Denver"), ("easy hiking near town", "Denver"),
+    ("live jazz tonight", "New York"), ("jazz clubs with dinner", "New York"),
+    ("seafood restaurants by the water", "Boston"), ("fresh seafood market", "Boston"),
+]
+
+
+def new_chatbot(tmp_path, online):
+    return PredictiveChatbot(model_path=str(tmp_path / 'model.pkl'),
+                             data_path=str(tmp_path / 'history.csv'), online=online)
+
+
+def test_online_updates_leave_the_published_model_untouched(tmp_path):
+    chatbot = new_chatbot(tmp_path, online=True)
+    for query, destination in QUERIES:
+        chatbot.record_query(query, destination)
+    chatbot.trainer.join()
+    published = chatbot._resources
+    centers = np.array(published['kmeans'].cluster_centers_)
+    suggestions = {destination: list(queries) for destination, queries in published['suggestions'].items()}
+
+    for query, destination in QUERIES[:4] + [("pizza and museums", "Miami")]:
+        chatbot.record_query(query, destination)
+    chatbot.trainer.join()
+
+    assert chatbot._resources is not published
+    assert np.array_equal(published['kmeans'].cluster_centers_, centers)
+    assert published['suggestions'] == suggestions
+
+
+def test_batch_training_without_the_online_trainer(tmp_path):
+    chatbot = new_chatbot(tmp_path, online=False)
+    for query, destination in QUERIES:
+        chatbot.record_query(query, destination)
+    assert chatbot.train_model()
+    assert chatbot.common_queries
+    assert chatbot.get_suggested_queries('Miami')
+
+
+def test_similar_queries_come_from_the_background_index(tmp_path):
+    chatbot = new_chatbot(tmp_path, online=False)
+    # Nothing is built (or imported) until the first query comes in
+    assert chatbot._similar_thread is None
+    for query, destination in QUERIES:
+        chatbot.record_query(query, destination)
+    chatbot._similar_thread.join()
+    similar = [query for _, query in chatbot.similar_queries('best pizza by the beach', 'Miami')]
+    assert similar[0] == 'best pizza near the beach'
+    # The question itself is not suggested back
+    assert 'best pizza near the beach' not in [
+        query for _, query in chatbot.similar_queries('Best pizza near the beach ', 'Miami')]
+
+
+def test_weighted_tfidf_matches_fitting_the_repeated_queries():
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    from predictive_chatbot import fit_weighted_tfidf
+
+    texts = [query for query, _ in QUERIES] + ["best pizza", "museums", "best hotels near the beach"]
+    weights = np.array([1, 3, 2, 1, 5, 1, 1, 2, 1, 1, 4, 1, 2, 3, 1], dtype=float)
+    expanded = [text for text, weight in zip(texts, weights) for _ in range(int(weight))]
+    for min_df, max_df in ((2, 0.7), (1, 1.0), (0.1, 10)):
+        expected = TfidfVectorizer(min_df=min_df, max_df=max_df, ngram_range=(1, 2)).fit(expanded)
+        vectorizer, X = fit_weighted_tfidf(texts, weights, min_df=min_df, max_df=max_df)
+        assert vectorizer.vocabulary_ == expected.vocabulary_
+        assert np.allclose(vectorizer.idf_, expected.idf_)
+        assert np.allclose(X.toarray(), expected.transform(texts).toarray())
+        assert np.allclose(vectorizer.transform(texts).toarray(), X.toarray())
+
+
+def test_suggestion_table_matches_pairwise_similarity():
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    from predictive_chatbot import SUGGESTION_THRESHOLD, update_suggestion_table
+
+    queries = [query for query, _ in QUERIES]
+    destinations = [destination for _, destination in QUERIES]
+    vectorizer = TfidfVectorizer(ngram_range=(1, 2)).fit(queries)
+    common = ["best pizza", "museums open late", "hiking trails", "jazz"]
+    table = update_suggestion_table({}, vectorizer, common, queries, destinations)
+
+    expected = {}
+    for query, destination in QUERIES:
+        for candidate in common:
+            score = (vectorizer.transform([candidate]) @ vectorizer.transform([query]).T).toarray()[0, 0]
+            if score > SUGGESTION_THRESHOLD:
+                expected.setdefault(destination, set()).add(candidate)
+    assert {destination: set(found) for destination, found in table.items()} == expected
+    # Entries keep the common queries' order
+    assert all(found == [c for c in common if c in found] for found in table.values())
+
+    # Updating a copy leaves the original table as it was
+    before = {destination: list(found) for destination, found in table.items()}
+    update_suggestion_table(dict(table), vectorizer, common, ["live jazz tonight"], ["Miami"])
+    assert table == before
+
+
+def test_queries_before_the_model_loads_reach_its_suggestion_table(tmp_path):
+    trained = new_chatbot(tmp_path, online=False)
+    for query, destination in QUERIES:
+        trained.record_query(query, destination)
+    assert trained.train_model()
+
+    # A fresh process loads the saved model lazily; its first query must
+    # still be matched against the common queries
+    chatbot = new_chatbot(tmp_path, online=False)
+    query = next(q for q, _ in QUERIES if q in trained.get_suggested_queries('Miami'))
+    chatbot.record_query(query, 'Portland')
+    assert query in chatbot._resources['suggestions'].get('Portland', [])
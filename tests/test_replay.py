@@ -0,0 +1,63 @@
+import http.server
+import threading
+
+import requests
+
+import replay
+
+PAGE = b'<html><head><title>Pizza</title></head><body>' + b'slice ' * 5000 + b'</body></html>'
+
+
+class PageHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('ETag', '"v1"')
+        self.send_header('Content-Length', str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def session(adapter):
+    s = requests.Session()
+    s.mount('http://', adapter)
+    s.mount('https://', adapter)
+    return s
+
+
+def test_recorded_pages_replay_as_recorded(tmp_path):
+    server = serve()
+    base = f'http://127.0.0.1:{server.server_port}'
+    try:
+        recorder = session(replay.RecordingAdapter(str(tmp_path)))
+        assert recorder.get(f'{base}/whole?key=secret').content == PAGE
+        streamed = recorder.get(f'{base}/streamed', stream=True)
+        # Streaming is left to the caller: nothing is read until it asks
+        assert not streamed._content_consumed
+        first = next(streamed.iter_content(1024))
+        streamed.close()
+    finally:
+        server.shutdown()
+
+    player = session(replay.ReplayAdapter(str(tmp_path)))
+    # Secret params are not part of the recording key
+    whole = player.get(f'{base}/whole?key=other')
+    assert whole.content == PAGE and whole.headers['ETag'] == '"v1"'
+    # A streamed page is recorded as far as it was read
+    assert player.get(f'{base}/streamed').content == first
+
+
+def test_unrecorded_requests_get_synthetic_answers(tmp_path):
+    adapter = replay.ReplayAdapter(str(tmp_path))
+    response = session(adapter).get('https://example.com/article')
+    assert response.status_code == 200 and response.text
+    assert adapter.stats() == {'page': 1}
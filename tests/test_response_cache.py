@@ -0,0 +1,55 @@
+import time
+
+from response_cache import MISSING, ResponseCache, cached
+
+
+def test_cached_value_unchanged_after_caller_mutates_it():
+    cache = ResponseCache()
+    calls = []
+
+    @cached('hotels', cache=cache)
+    def offers(city):
+        calls.append(city)
+        return {'offers': [{'price': 100}]}
+
+    first = offers('Paris')
+    first['offers'].append({'price': 1})
+    second = offers('paris')
+    second['offers'][0]['price'] = 0
+
+    assert offers('Paris') == {'offers': [{'price': 100}]}
+    assert calls == ['Paris']
+
+
+def test_error_results_are_not_cached():
+    cache = ResponseCache()
+    calls = []
+
+    @cached('hotels', cache=cache)
+    def offers(city):
+        calls.append(city)
+        return {'error': 'upstream down'}
+
+    offers('Paris')
+    offers('Paris')
+    assert len(calls) == 2
+
+
+def test_disk_tier_survives_restart_and_expired_rows_are_purged(tmp_path):
+    db_path = str(tmp_path / 'cache.sqlite')
+    cache = ResponseCache(db_path=db_path)
+    cache.set('hotels', 'fresh', {'name': 'kept'})
+    cache.set('hotels', 'stale', {'name': 'gone'}, ttl=-1)
+
+    reopened = ResponseCache(db_path=db_path)
+    assert reopened.get('hotels', 'fresh') == {'name': 'kept'}
+    assert reopened.get('hotels', 'stale') is MISSING
+    rows = reopened._db.execute("SELECT key FROM responses").fetchall()
+    assert rows == [('fresh',)]
+
+
+def test_memory_tier_expires():
+    cache = ResponseCache()
+    cache.set('hotels', 'key', [1], ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get('hotels', 'key') is MISSING
@@ -0,0 +1,43 @@
+import time
+
+import requests
+
+import http_client
+import search_orchestrator
+
+
+def hanging(timeouts):
+    def request(self, method, url, timeout=None, **kwargs):
+        timeouts.append(timeout)
+        time.sleep(timeout[1] if isinstance(timeout, tuple) else timeout)
+        raise requests.Timeout("read timed out")
+    return request
+
+
+def test_hung_provider_gives_up_at_the_search_deadline(monkeypatch):
+    timeouts = []
+    monkeypatch.setattr(requests.Session, 'request', hanging(timeouts))
+    client = http_client.HttpClient()
+
+    def provider():
+        client.get('http://hung.example/offers')
+
+    start = time.monotonic()
+    results, _ = search_orchestrator.run_search({'flights': provider}, deadline=0.3)
+    assert results['flights']['error']
+    # The abandoned call must also stop, freeing its worker, instead of
+    # running the full 15s read timeout and every retry
+    time.sleep(0.1)
+    attempts = len(timeouts)
+    time.sleep(0.5)
+    assert len(timeouts) == attempts
+    assert all(read <= 0.3 for _, read in timeouts)
+    assert time.monotonic() - start < 1.5
+
+
+def test_deadline_blocks_keep_the_earlier_deadline():
+    with http_client.deadline(1):
+        with http_client.deadline(60):
+            assert http_client._time_left() <= 1
+        assert http_client._time_left() <= 1
+    assert http_client._time_left() is None
@@ -0,0 +1,45 @@
+import itertools
+import random
+
+from similarity_index import SimilarityIndex
+
+TOPICS = ['pizza', 'museums', 'hiking trails', 'jazz clubs', 'seafood', 'street food', 'beaches',
+          'nightlife', 'bike rentals', 'farmers markets', 'rooftop bars', 'bookstores']
+ASKS = ['best {} in {}', 'cheap {} near {}', 'where to find {} around {}', 'family friendly {} in {}',
+        'are there good {} in {}', 'top rated {} close to {}']
+CITIES = ['Seattle', 'Chicago', 'Miami', 'Denver', 'Boston', 'Austin', 'Portland', 'Atlanta',
+          'Phoenix', 'Nashville', 'Detroit', 'Houston']
+
+
+def corpus():
+    rows = [(ask.format(topic, city), city) for ask, topic, city in itertools.product(ASKS, TOPICS, CITIES)]
+    return [query for query, _ in rows], [destination for _, destination in rows]
+
+
+def test_lsh_search_finds_what_exact_search_finds():
+    queries, destinations = corpus()
+    index = SimilarityIndex(lsh_threshold=0).build(queries, destinations)
+    rng = random.Random(7)
+    found = total = 0
+    for query in rng.sample(queries, 100):
+        probe = ' '.join(word for word in query.split() if word != 'in')
+        exact = index.search(probe, k=5, exact=True)
+        approx = index.search(probe, k=5)
+        exact_scores = dict((q, score) for score, q in index.search(probe, k=len(queries), exact=True))
+        # LSH only skips rows; whatever it returns is scored exactly
+        for score, hit in approx:
+            assert abs(exact_scores[hit] - score) < 1e-9
+        kth = exact[-1][0]
+        found += sum(1 for score, _ in approx if score >= kth - 1e-9)
+        total += len(exact)
+    assert found / total >= 0.9
+
+
+def test_destination_filter_and_added_rows():
+    queries, destinations = corpus()
+    index = SimilarityIndex(lsh_threshold=0).build(queries, destinations)
+    hits = index.search('best pizza', destination='Miami', k=3)
+    assert hits and all(query.endswith('Miami') for _, query in hits)
+    index.add('gelato shops open late in Miami', 'Miami')
+    assert index.search('gelato shops open late', destination='Miami', k=1)[0][1] == 'gelato shops open late in Miami'
+    assert index.search('gelato', destination='Unknown') == []
@@ -0,0 +1,74 @@
+import token_manager
+from token_manager import TokenManager
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+class TokenResponse:
+    status_code = 200
+
+    def __init__(self, n):
+        self.n = n
+
+    def json(self):
+        return {'access_token': f'token-{self.n}', 'expires_in': 1799}
+
+
+def test_refresh_happens_refresh_ahead_before_expiry(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(token_manager.time, 'time', clock.time)
+    fetched = []
+
+    def post(url, data):
+        fetched.append(clock.now)
+        return TokenResponse(len(fetched))
+
+    monkeypatch.setattr(token_manager.http_client, 'post', post)
+    manager = TokenManager('id', 'secret', expiry_margin=60, refresh_ahead=300)
+    monkeypatch.setattr(manager, '_start_refresher', lambda: None)
+    assert manager.get_token() == 'token-1'
+
+    def wait(seconds):
+        clock.now += seconds
+        return len(fetched) >= 4
+
+    monkeypatch.setattr(manager._stop, 'wait', wait)
+    manager._refresh_loop()
+
+    # Each token lives 1799 - 60 s; its successor is fetched 300 s before that
+    gaps = [later - earlier for earlier, later in zip(fetched, fetched[1:])]
+    assert gaps == [1799 - 60 - 300] * 3
+    assert manager.get_token() == 'token-4'
+
+
+def test_short_lived_tokens_are_renewed_halfway(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(token_manager.time, 'time', clock.time)
+    fetched = []
+
+    class ShortResponse(TokenResponse):
+        def json(self):
+            return {'access_token': 'short', 'expires_in': 260}
+
+    def post(url, data):
+        fetched.append(clock.now)
+        return ShortResponse(len(fetched))
+
+    monkeypatch.setattr(token_manager.http_client, 'post', post)
+    manager = TokenManager('id', 'secret', expiry_margin=60, refresh_ahead=300)
+    monkeypatch.setattr(manager, '_start_refresher', lambda: None)
+    manager.get_token()
+
+    def wait(seconds):
+        clock.now += seconds
+        return len(fetched) >= 3
+
+    monkeypatch.setattr(manager._stop, 'wait', wait)
+    manager._refresh_loop()
+    assert [later - earlier for earlier, later in zip(fetched, fetched[1:])] == [100, 100]
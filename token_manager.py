@@ -0,0 +1,133 @@
+import logging
+import threading
+import time
+
+import requests
+
+import http_client
+
+AUTH_URL = 'https://test.api.amadeus.com/v1/security/oauth2/token'
+
+logger = logging.getLogger(__name__)
+
+
+class TokenManager:
+    """Thread-safe holder for one Amadeus OAuth token shared by all sessions.
+
+    Only one refresh runs at a time: callers that find the token expired
+    wait on the lock and then reuse the token the first caller fetched.
+    A background thread renews the token `refresh_ahead` seconds before it
+    expires so requests normally never wait on the OAuth endpoint. A failed
+    renewal keeps the current token and is retried with backoff.
+    """
+
+    def __init__(self, client_id, client_secret, auth_url=AUTH_URL,
+                 expiry_margin=60, refresh_ahead=300, retry_base=5, retry_max=120):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.auth_url = auth_url
+        self.expiry_margin = expiry_margin
+        self.refresh_ahead = refresh_ahead
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        # (token, expiry, refresh time) is swapped as one tuple so readers
+        # never see a mix
+        self._state = (None, 0, 0)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher = None
+
+    def _valid_token(self):
+        token, expires_at, _ = self._state
+        if token and time.time() < expires_at:
+            return token
+        return None
+
+    def get_token(self):
+        """Return a valid access token, fetching one if needed (None on failure)"""
+        token = self._valid_token()
+        if token:
+            return token
+        with self._lock:
+            # Another caller may have refreshed while we waited for the lock
+            token = self._valid_token()
+            if token:
+                return token
+            return self._fetch()
+
+    def _fetch(self):
+        """Request a new token; must be called with the lock held.
+
+        Returns None on any failure and leaves the current token in place.
+        """
+        auth_data = {
+            'grant_type': 'client_credentials',
+            'client_id': self.client_id,
+            'client_secret': self.client_secret
+        }
+        try:
+            response = http_client.post(self.auth_url, data=auth_data)
+        except requests.RequestException as e:
+            logger.warning("Token request failed: %s", e)
+            return None
+        if response.status_code != 200:
+            logger.warning("Token request failed: HTTP %s", response.status_code)
+            return None
+        try:
+            data = response.json()
+            token = data['access_token']
+            expires_in = float(data['expires_in'])
+        except (KeyError, ValueError, TypeError) as e:
+            logger.warning("Token response was malformed: %r", e)
+            return None
+        now = time.time()
+        lifetime = expires_in - self.expiry_margin
+        # Short-lived tokens are renewed halfway through their lifetime
+        ahead = min(self.refresh_ahead, lifetime / 2)
+        self._state = (token, now + lifetime, now + lifetime - ahead)
+        self._start_refresher()
+        return token
+
+    def _start_refresher(self):
+        if self._refresher is None or not self._refresher.is_alive():
+            self._refresher = threading.Thread(
+                target=self._refresh_loop, name="amadeus-token-refresh", daemon=True
+            )
+            self._refresher.start()
+
+    def _refresh_loop(self):
+        failures = 0
+        while not self._stop.is_set():
+            _, _, refresh_at = self._state
+            delay = refresh_at - time.time()
+            if delay > 0:
+                # Wake up early if stopped; otherwise sleep until refresh time
+                if self._stop.wait(delay):
+                    return
+                continue
+            with self._lock:
+                token = self._fetch()
+            if token is None:
+                failures += 1
+                delay = min(self.retry_max, self.retry_base * 2 ** (failures - 1))
+                if self._stop.wait(delay):
+                    return
+            else:
+                failures = 0
+
+    def stop(self):
+        self._stop.set()
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_token_manager(client_id, client_secret):
+    """Return the process-wide manager for these credentials"""
+    with _managers_lock:
+        manager = _managers.get((client_id, client_secret))
+        if manager is None:
+            manager = TokenManager(client_id, client_secret)
+            _managers[(client_id, client_secret)] = manager
+        return manager
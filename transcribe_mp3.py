@@ -2,23 +2,43 @@
 
 
 # transcribe_mp3.py
-from transformers import pipeline
+import os
+
+# Where the transcript is saved and read back by the app
+TRANSCRIPT_PATH = os.getenv(
+    "TRANSCRIPT_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "audiototext.txt")
+)
+
 def transcribe_mp3(mp3_path: str, output_path: str):
     """
     Transcribe the MP3 file at `mp3_path` using a Whisper model
     and save the transcription to `output_path`.
     """
+    # transformers takes seconds to import, so only load it to transcribe
+    from transformers import pipeline
     asr_pipeline = pipeline("automatic-speech-recognition", model="your-username/whisper-fine-tuned-travel",return_timestamps=True)
     result = asr_pipeline(mp3_path)
     with open(output_path, "w", encoding="utf-8") as f:
         f.write(result["text"] + "\n")
+
+def read_transcript(path=TRANSCRIPT_PATH):
+    """Return the saved transcript, or an empty string if there is none yet"""
+    if not os.path.exists(path):
+        return ""
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def __getattr__(name):
+    # TRANSCRIPT_TEXT used to be read at import time; now it is read on access
+    if name == "TRANSCRIPT_TEXT":
+        return read_transcript()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 if __name__ == "__main__":
     #MP3_FILE = "/mnt/c/Users/degar/OneDrive/Desktop/Team_7_Project_3/Emotions.mp3"
-    MP3_FILE = "C:\Users\Bryan\Desktop\Final_Project\Team_7_Project_3\Recording.mp3"
-    OUTPUT_FILE = "C:\Users\Bryan\Desktop\Final_Project\Team_7_Project_3\audiototext.txt"
+    MP3_FILE = os.path.join(os.path.dirname(TRANSCRIPT_PATH), "Recording.mp3")
+    OUTPUT_FILE = TRANSCRIPT_PATH
     transcribe_mp3(MP3_FILE, OUTPUT_FILE)
     print("Done! Transcription saved to:", OUTPUT_FILE)
 #/mnt/c/Users/tyler/OneDrive/Desktop/whispertest.py
-
-with open("/mnt/c/Users/degar/OneDrive/Desktop/Team_7_Project_3/audiototext.txt", "r", encoding="utf-8") as f:
-    TRANSCRIPT_TEXT = f.read()
\ No newline at end of file
@@ -0,0 +1,190 @@
+import os
+import threading
+import urllib.parse
+
+import requests
+from dotenv import load_dotenv
+
+import http_client
+from airport_index import AirportIndex, MISS
+from response_cache import cached
+from token_manager import get_token_manager
+
+# Amadeus API credentials
+load_dotenv()
+client_id = os.getenv("api_key")
+client_secret = os.getenv("api_secret")
+google_api = os.getenv("GOOGLE_PLACES_API_KEY")
+
+# Hotels are fetched once for this radius (km); smaller radii are filtered locally
+HOTEL_SEARCH_RADIUS = 25
+
+# Amadeus Token Request: one token and one refresh at a time for the whole
+# process, shared by every session
+def get_access_token():
+    return get_token_manager(client_id, client_secret).get_token()
+    
+# Offline airport/city index, built once per process from the bundled CSVs
+_airport_index = None
+_airport_index_lock = threading.Lock()
+
+def get_airport_index():
+    global _airport_index
+    with _airport_index_lock:
+        if _airport_index is None:
+            _airport_index = AirportIndex()
+        return _airport_index
+
+#Function to convert city name to destination IATA code
+def city_to_iata(city_name):
+    # Answer from the local index first; only unknown or ambiguous names
+    # go to the Amadeus locations API
+    index = get_airport_index()
+    code = index.lookup(city_name)
+    if code is not MISS:
+        return code
+    code = lookup_city_code(city_name)
+    if not isinstance(code, dict):
+        index.remember(city_name, code)
+    return code
+
+@cached('locations')
+def lookup_city_code(city_name):
+    token = get_access_token()
+    if not token:
+        return {"error": "Failed to get access token"}
+    headers = {'Authorization': f'Bearer {token}'}
+    params = {
+        'keyword': city_name,
+        'subType': 'CITY' 
+    }
+    url = 'https://test.api.amadeus.com/v1/reference-data/locations'
+    try:
+        response = http_client.get(url, headers=headers, params=params)
+    except requests.RequestException as e:
+        return {"error": f"Location lookup failed: {str(e)}"}
+    if response.status_code == 200:
+        data = response.json().get('data', [])
+        return data[0].get('iataCode') if data else None
+    else:
+        return {"error": response.text}
+    
+# Function to get flight offers
+@cached('flight_offers')
+def get_flight_offers(origin, destination, date, adults=1, max_results=50):
+    token = get_access_token()
+    if not token:
+        return {"error": "Failed to get access token"}
+    headers = {'Authorization': f'Bearer {token}'}
+    params = {
+        'originLocationCode': origin,
+        'destinationLocationCode': destination,
+        'departureDate': date,
+        'adults': adults,
+        'currencyCode': 'USD',
+        'max': max_results
+    }
+    url = 'https://test.api.amadeus.com/v2/shopping/flight-offers'
+    try:
+        response = http_client.get(url, headers=headers, params=params)
+    except requests.RequestException as e:
+        return {"error": f"Flight search failed: {str(e)}"}
+    if response.status_code == 200:
+        data = response.json().get('data', [])
+        return data
+    else:
+        return {"error": response.text}
+
+# Function to get hotel offers
+@cached('hotels')
+def get_hotels(city_code, radius=HOTEL_SEARCH_RADIUS):
+    token = get_access_token()
+    if not token:
+        return {"error": "Failed to get access token"}
+    headers = {
+        'Authorization': f'Bearer {token}'
+    }
+    params = {
+        'cityCode': city_code,
+        'radius': radius,
+        'radiusUnit': 'KM',
+        'ratings': '3,4,5',  # Optional: filter by star ratings
+        'hotelSource': 'ALL'  # ALL, BEDBANK, or DIRECTCHAIN
+    }
+    hotels_url = 'https://test.api.amadeus.com/v1/reference-data/locations/hotels/by-city'
+    try:
+        response = http_client.get(hotels_url, headers=headers, params=params)
+    except requests.RequestException as e:
+        return {"error": f"Hotel search failed: {str(e)}"}
+    if response.status_code == 200:
+        return response.json()['data']
+    else:
+        return {"error": f"API Request failed: {response.status_code}, {response.text}"}
+    
+# Prices for one page of hotels, fetched in a single multi-id request
+@cached('hotel_offers')
+def get_hotel_offers(hotel_ids, check_in, adults=1):
+    token = get_access_token()
+    if not token:
+        return {"error": "Failed to get access token"}
+    headers = {'Authorization': f'Bearer {token}'}
+    params = {
+        'hotelIds': ','.join(hotel_ids),
+        'checkInDate': check_in,
+        'adults': adults,
+        'currency': 'USD',
+        'bestRateOnly': 'true'
+    }
+    url = 'https://test.api.amadeus.com/v3/shopping/hotel-offers'
+    try:
+        response = http_client.get(url, headers=headers, params=params)
+    except requests.RequestException as e:
+        return {"error": f"Hotel price search failed: {str(e)}"}
+    if response.status_code == 200:
+        # Map each available hotel to its best price
+        prices = {}
+        for item in response.json().get('data', []):
+            offers = item.get('offers') or []
+            if item.get('available') and offers:
+                price = offers[0]['price']
+                prices[item['hotel']['hotelId']] = f"{price.get('currency', '')} {price.get('total')}"
+        return prices
+    else:
+        return {"error": f"API Request failed: {response.status_code}, {response.text}"}
+
+# Attractions by City   
+def get_attractions_by_city(city_name, google_api):
+    
+    # Ensure city name is properly URL encoded
+    encoded_city = urllib.parse.quote(city_name)
+    
+    # Construct the Places API URL for text search
+    base_url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
+    search_query = f"top attractions in {encoded_city}"
+    url = f"{base_url}?query={urllib.parse.quote(search_query)}&key={google_api}"
+    try:
+        # Make the API request
+        response = http_client.get(url)
+        data = response.json()
+        
+        # Check if the request was successful
+        if response.status_code != 200 or data.get('status') != 'OK':
+            print(f"API Error: {data.get('status')} - {data.get('error_message', 'Unknown error')}")
+            return []
+        
+        # Extract and format attraction information
+        attractions = []
+        for place in data.get('results', [])[:5]:  # Get top 5 attractions
+            attraction = {
+                "name": place.get('name', 'Unnamed Attraction'),
+                "rating": place.get('rating', 'No rating'),
+                "address": place.get('formatted_address', 'No address available'),
+                "place_id": place.get('place_id', ''),  # Store the place_id for potential detail requests
+                "lat": place.get('geometry', {}).get('location', {}).get('lat'),
+                "lng": place.get('geometry', {}).get('location', {}).get('lng')
+            }
+            attractions.append(attraction)  
+        return attractions    
+    except Exception as e:
+        print(f"Error fetching attractions data: {str(e)}")
+        return []
@@ -0,0 +1,215 @@
+import logging
+import os
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError
+
+import http_client
+import metrics
+from html_extract import extract_snippet, iter_response_text, SNIPPET_LENGTH
+from knowledge_index import default_index
+from page_cache import default_page_cache
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.212 Safari/537.36"
+}
+
+# Seconds allowed for one page, and for the search plus all page fetches
+# of one answer
+PAGE_TIMEOUT = float(os.getenv("WEB_PAGE_TIMEOUT", "5"))
+SEARCH_BUDGET = float(os.getenv("WEB_SEARCH_BUDGET", "6"))
+
+logger = logging.getLogger(__name__)
+
+# Shared pool for page downloads across all sessions
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("WEB_SEARCH_WORKERS", "8")),
+                               thread_name_prefix="pages")
+
+
+def search_urls(query, num_results=3, timeout=PAGE_TIMEOUT):
+    """Return the top result URLs for a query, reusing recent answers"""
+    urls = default_page_cache.get_urls(query, num_results)
+    if urls:
+        return urls
+    urls = _search_urls(query, num_results, timeout)
+    if urls:
+        default_page_cache.put_urls(query, urls, num_results)
+    return urls
+
+
+def _search_urls(query, num_results, timeout=PAGE_TIMEOUT):
+    try:
+        if http_client.default_client.adapter is not None:
+            # googlesearch has its own HTTP stack; use the path replay can serve
+            raise Exception("Replaying upstream responses")
+        from googlesearch import search as google_search
+        urls = []
+        if callable(google_search):
+            for url in google_search(query, num_results=num_results):
+                urls.append(url)
+        if not urls:
+            raise Exception("No results from googlesearch-python")
+        return urls[:num_results]
+    except Exception as e:
+        # Fall back to scraping the Google results page
+        from bs4 import BeautifulSoup
+        encoded_query = urllib.parse.quote(query)
+        search_url = f"https://www.google.com/search?q={encoded_query}"
+        response = http_client.get(search_url, headers=HEADERS, timeout=timeout, retries=0)
+        soup = BeautifulSoup(response.text, 'html.parser')
+
+        urls = []
+        for link in soup.find_all('a'):
+            href = link.get('href')
+            if href and href.startswith('/url?q='):
+                url = href.split('/url?q=')[1].split('&')[0]
+                if url.startswith('http') and not url.startswith('https://accounts.google.com'):
+                    urls.append(url)
+                    if len(urls) >= num_results:
+                        break
+        return urls
+
+
+def fetch_page(url, timeout=PAGE_TIMEOUT):
+    """Download one result page and summarize it as a title/link/snippet dict.
+
+    A stored copy whose revalidation fails is served stale rather than lost.
+    """
+    cached = default_page_cache.get_page(url)
+    if cached and cached['fresh']:
+        return {key: cached[key] for key in ('title', 'link', 'snippet')}
+    try:
+        headers = dict(HEADERS)
+        if cached:
+            headers.update(default_page_cache.conditional_headers(cached))
+        # Single attempt with a short timeout: a slow page is skipped
+        response = http_client.get(url, headers=headers, timeout=timeout, retries=0, stream=True)
+        try:
+            if response.status_code == 304 and cached:
+                # Unchanged since we stored it: skip the download and the parse
+                default_page_cache.mark_revalidated(url)
+                return {key: cached[key] for key in ('title', 'link', 'snippet')}
+            if response.status_code != 200:
+                if cached:
+                    return {key: cached[key] for key in ('title', 'link', 'snippet')}
+                return {
+                    'title': "Could not fetch page",
+                    'link': url,
+                    'snippet': "Unable to access this page."
+                }
+            # Parse while downloading and stop once there is enough text
+            title, content = extract_snippet(iter_response_text(response))
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+        finally:
+            response.close()
+        # Truncate if too long
+        snippet = content[:SNIPPET_LENGTH] + "..." if len(content) > SNIPPET_LENGTH else content
+        default_page_cache.put_page(url, title, snippet, etag, last_modified)
+        return {
+            'title': title,
+            'link': url,
+            'snippet': snippet
+        }
+    except Exception as e:
+        if cached:
+            return {key: cached[key] for key in ('title', 'link', 'snippet')}
+        return {
+            'title': "Unable to process page",
+            'link': url,
+            'snippet': "Could not extract content from this page."
+        }
+
+
+def iter_pages(urls, budget=SEARCH_BUDGET, deadline=None):
+    """Fetch result pages concurrently, yielding (rank, result) as each one finishes.
+
+    Fetching stops at `deadline` (a time.monotonic() value), by default
+    `budget` seconds from now. Pages still loading then are dropped; their
+    downloads are abandoned in the background.
+    """
+    if deadline is None:
+        deadline = time.monotonic() + budget
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        if urls:
+            logger.info("Web search budget used up by the search; skipped %d page(s)", len(urls))
+        return
+    futures = {
+        _executor.submit(fetch_page, url, min(PAGE_TIMEOUT, remaining)): rank
+        for rank, url in enumerate(urls)
+    }
+    try:
+        for future in as_completed(futures, timeout=remaining):
+            yield futures[future], future.result()
+    except TimeoutError:
+        for future in futures:
+            future.cancel()
+        logger.info("Web search budget used up; dropped %d slow page(s)", sum(not f.done() for f in futures))
+
+
+def _search_with_deadline(query, num_results, budget):
+    """Search for result URLs; returns (urls, deadline) with the budget starting now"""
+    deadline = time.monotonic() + budget
+    try:
+        urls = search_urls(query, num_results, timeout=min(PAGE_TIMEOUT, budget))
+    except Exception as e:
+        urls = []
+    return urls, deadline
+
+
+# Google Search
+def web_search(query, num_results=3, budget=SEARCH_BUDGET):
+    urls, deadline = _search_with_deadline(query, num_results, budget)
+    # Keep the search engine's ranking no matter which page finished first
+    results = sorted(iter_pages(urls, deadline=deadline), key=lambda item: item[0])
+    return [result for _, result in results]
+
+
+def _format_result(i, result):
+    return f"{i}. **{result['title']}**\n   {result['snippet']}\n   [Read more]({result['link']})\n\n"
+
+
+def stream_chatbot_response(query, destination=None, ranked=False):
+    """Yield the chatbot answer in markdown pieces, one search result at a time.
+
+    Web results are yielded in the order their pages finish loading, so the
+    first one shows up after the fastest page instead of the slowest.
+    With `ranked`, they wait for every page and follow the search ranking.
+    """
+    # Prepare search query
+    search_query = query
+    if destination and destination.lower() not in query.lower():
+        search_query = f"{query} {destination}"
+
+    # Answer from what earlier searches and attraction lookups already found
+    indexed = default_index.answer(query, destination)
+    if indexed:
+        metrics.inc('chat_answers_total', source='index')
+        yield f"Here's what I found about your question:\n\n"
+        for i, result in enumerate(indexed, 1):
+            yield _format_result(i, result)
+        return
+
+    # Perform web search; the budget covers the search and the page fetches
+    urls, deadline = _search_with_deadline(search_query, 3, SEARCH_BUDGET)
+    pages = iter_pages(urls, deadline=deadline)
+    if ranked:
+        pages = sorted(pages, key=lambda item: item[0])
+    results = []
+    for _, result in pages:
+        if not results:
+            yield f"Here's what I found about your question:\n\n"
+        results.append(result)
+        yield _format_result(len(results), result)
+    default_index.add_results(results, destination)
+    metrics.inc('chat_answers_total', source='web' if results else 'none')
+
+    if not results:
+        # Simple fallback response if search fails
+        dest_text = f" about {destination}" if destination else ""
+        yield f"I couldn't find specific information for your query{dest_text}. Could you try asking a more specific question?"
+
+
+def chatbot_response(query, destination=None):
+    return ''.join(stream_chatbot_response(query, destination, ranked=True))